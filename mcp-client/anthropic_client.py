@@ -0,0 +1,57 @@
+import asyncio
+import random
+from contextlib import AsyncExitStack, asynccontextmanager
+
+import httpx
+from anthropic import AsyncAnthropic, APIStatusError, RateLimitError, DefaultAsyncHttpxClient
+from dotenv import load_dotenv
+
+load_dotenv()  # load environment variables from .env
+
+# One pooled HTTP client shared by the chat client and every GM agent so connections to the API are reused
+_HTTP_CLIENT = DefaultAsyncHttpxClient(
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+)
+shared_anthropic = AsyncAnthropic(http_client=_HTTP_CLIENT)
+
+# Cap on concurrent Claude requests, and retry policy for rate limits / overload
+api_semaphore = asyncio.Semaphore(8)
+MAX_API_ATTEMPTS = 5
+
+def _should_retry(error: APIStatusError, attempt: int) -> bool:
+    """Check whether a failed request should be retried"""
+    retryable = isinstance(error, RateLimitError) or error.status_code == 529
+    return retryable and attempt < MAX_API_ATTEMPTS - 1
+
+async def _backoff(attempt: int):
+    """Sleep with jittered exponential backoff"""
+    await asyncio.sleep(min(30, 0.5 * 2 ** attempt) + random.random() * 0.25)
+
+async def create_message(client: AsyncAnthropic, **params):
+    """Create a Claude message behind the concurrency limit, retrying on rate limits"""
+    async with api_semaphore:
+        for attempt in range(MAX_API_ATTEMPTS):
+            try:
+                return await client.messages.create(**params)
+            except APIStatusError as e:
+                if not _should_retry(e, attempt):
+                    raise
+                await _backoff(attempt)
+
+@asynccontextmanager
+async def open_message_stream(client: AsyncAnthropic, **params):
+    """Open a Claude message stream behind the concurrency limit, retrying on rate limits"""
+    async with api_semaphore, AsyncExitStack() as stack:
+        for attempt in range(MAX_API_ATTEMPTS):
+            try:
+                stream = await stack.enter_async_context(client.messages.stream(**params))
+                break
+            except APIStatusError as e:
+                if not _should_retry(e, attempt):
+                    raise
+                await _backoff(attempt)
+        yield stream
+
+async def close_anthropic_client():
+    """Close the shared Anthropic HTTP connection pool"""
+    await shared_anthropic.close()
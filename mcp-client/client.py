@@ -1,24 +1,44 @@
 import asyncio
 import sys
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, AsyncIterator
 from contextlib import AsyncExitStack
 
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 
-from anthropic import Anthropic
+from anthropic_client import shared_anthropic, open_message_stream, close_anthropic_client
 from dotenv import load_dotenv
 
+try:
+    import uvloop
+except ImportError:  # uvloop is optional (not available on Windows)
+    uvloop = None
+
 load_dotenv()  # load environment variables from .env
 
+# Models used for chat; simple turns go to the faster, cheaper model
+DEFAULT_MODEL = "claude-3-5-sonnet-20241022"
+FAST_MODEL = "claude-3-5-haiku-latest"
+FAST_PATH_MAX_CHARS = 80
+# Upper bound on Claude round-trips per query, in case tools keep getting requested
+MAX_TOOL_ROUNDS = 8
+# Messages mentioning any of these likely need NBA data tools
+TOOL_KEYWORDS = (
+    "trade", "stat", "salary", "cap", "contract", "roster", "player", "draft",
+    "pick", "points", "ppg", "rebound", "assist", "score", "game", "standing", "record"
+)
+
 class MCPClient:
-    def __init__(self):
+    def __init__(self, server_script_path: Optional[str] = None):
         # Initialize session and client objects
+        self.server_script_path = server_script_path
         self.session: Optional[ClientSession] = None
-        self.exit_stack = AsyncExitStack()
-        self.anthropic = Anthropic()
+        self.exit_stack: Optional[AsyncExitStack] = None
+        self.anthropic = shared_anthropic
         self.stdio = None
         self.write = None
+        self._available_tools: List[Dict] = []
+        self._system_blocks: Dict[str, List[Dict]] = {}
         
         # Initialize messages with system prompt
         self.messages = []
@@ -35,7 +55,21 @@ class MCPClient:
 
     def get_team_specific_prompt(self, team: str) -> str:
         """Get a team-specific system prompt"""
-        return f"{self.base_system_prompt}\nYou are the GM of the {team}. Consider your team's specific needs, roster, and situation when discussing trades."
+        return f"{self.base_system_prompt}\n{self.get_team_suffix(team)}"
+
+    def get_team_suffix(self, team: str) -> str:
+        """Get the team-specific part of the system prompt"""
+        return f"You are the GM of the {team}. Consider your team's specific needs, roster, and situation when discussing trades."
+
+    def get_system_blocks(self, team: str) -> List[Dict]:
+        """Get the system prompt as content blocks with the shared base prompt cached"""
+        # The blocks are static per team, so build them once and reuse them
+        if team not in self._system_blocks:
+            self._system_blocks[team] = [
+                {"type": "text", "text": self.base_system_prompt, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": self.get_team_suffix(team)}
+            ]
+        return self._system_blocks[team]
 
     async def connect_to_server(self, server_script_path: str):
         """Connect to an MCP server
@@ -43,6 +77,11 @@ class MCPClient:
         Args:
             server_script_path: Path to the server script (.py or .js)
         """
+        if self.session:
+            raise RuntimeError("Already connected to a server")
+        
+        # Always start from a fresh exit stack so a failed connect leaves nothing behind
+        self.exit_stack = AsyncExitStack()
         try:
             is_python = server_script_path.endswith('.py')
             is_js = server_script_path.endswith('.js')
@@ -62,17 +101,72 @@ class MCPClient:
             
             await self.session.initialize()
             
-            # List available tools
-            response = await self.session.list_tools()
-            tools = response.tools
-            print("\nConnected to server with tools:", [tool.name for tool in tools])
+            # List available tools once; schemas are static for the session
+            await self.refresh_tools()
+            print("\nConnected to server with tools:", [tool["name"] for tool in self._available_tools])
         except Exception as e:
             await self.cleanup()
             raise e
 
+    async def refresh_tools(self):
+        """Re-fetch the tool list from the server and update the cache"""
+        if not self.session:
+            raise RuntimeError("Not connected to server")
+        
+        response = await self.session.list_tools()
+        self._available_tools = [{ 
+            "name": tool.name,
+            "description": tool.description,
+            "input_schema": tool.inputSchema
+        } for tool in response.tools]
+        # Mark the end of the tool list so the schemas are part of the cached prefix
+        if self._available_tools:
+            self._available_tools[-1]["cache_control"] = {"type": "ephemeral"}
+
+    def _tool_result_content(self, result) -> List[Dict]:
+        """Convert an MCP tool result into Anthropic tool_result content blocks"""
+        return [
+            {"type": "text", "text": content.text}
+            for content in result.content
+            if content.type == 'text'
+        ]
+
+    def _choose_model(self, messages: List[Dict]) -> str:
+        """Pick the fast model for short small-talk turns, otherwise the default model"""
+        if not messages or messages[-1].get("role") != "user":
+            return DEFAULT_MODEL
+        
+        # Any earlier tool use means the conversation depends on tool results
+        for message in messages:
+            content = message.get("content")
+            if isinstance(content, list) and any(
+                isinstance(block, dict) and block.get("type") in ("tool_use", "tool_result")
+                for block in content
+            ):
+                return DEFAULT_MODEL
+        
+        query = messages[-1].get("content")
+        if not isinstance(query, str) or len(query) >= FAST_PATH_MAX_CHARS:
+            return DEFAULT_MODEL
+        
+        lowered = query.lower()
+        if any(keyword in lowered for keyword in TOOL_KEYWORDS):
+            return DEFAULT_MODEL
+        
+        return FAST_MODEL
+
     async def process_query(self, messages: List[Dict[str, str]], team: str) -> str:
         """Process a query using Claude and available tools
         
+        Args:
+            messages: List of message dictionaries with 'role' and 'content'
+            team: The NBA team to generate a response for
+        """
+        return "".join([text async for text in self.stream_query(messages, team)])
+
+    async def stream_query(self, messages: List[Dict[str, str]], team: str) -> AsyncIterator[str]:
+        """Process a query using Claude and available tools, yielding text as it is generated
+        
         Args:
             messages: List of message dictionaries with 'role' and 'content'
             team: The NBA team to generate a response for
@@ -80,71 +174,62 @@ class MCPClient:
         if not self.session:
             raise RuntimeError("Not connected to server")
         
-        print("!", messages)
-            
-        # Set messages and system prompt
-        self.messages = messages
-        system_prompt = self.get_team_specific_prompt(team)
+        # Keep this request's conversation local, since the client is shared between requests
+        conversation = list(messages)
+        system_prompt = self.get_system_blocks(team)
 
-        print("hey!!")
+        model = self._choose_model(conversation)
+        # The fast path skips the tool schemas entirely
+        available_tools = self._available_tools if model == DEFAULT_MODEL else []
 
-        response = await self.session.list_tools()
-        available_tools = [{ 
-            "name": tool.name,
-            "description": tool.description,
-            "input_schema": tool.inputSchema
-        } for tool in response.tools]
+        claude_params = {
+            "model": model,
+            "max_tokens": 1000,
+            "messages": conversation,
+            "system": system_prompt
+        }
+        if available_tools:
+            claude_params["tools"] = available_tools
 
-        print("??")
-
-        # Initial Claude API call
-        response = self.anthropic.messages.create(
-            model="claude-3-5-sonnet-20241022",
-            max_tokens=1000,
-            messages=self.messages,
-            system=system_prompt,
-            tools=available_tools
-        )
-
-        print("response gotten")
-
-        # Process response and handle tool calls
-        tool_results = []
-        final_text = []
-
-        for content in response.content:
-            if content.type == 'text':
-                final_text.append(content.text)
-            elif content.type == 'tool_use':
-                tool_name = content.name
-                tool_args = content.input
-                
-                # Execute tool call
-                result = await self.session.call_tool(tool_name, tool_args)
-                tool_results.append({"call": tool_name, "result": result})
-                final_text.append(f"[Calling tool {tool_name} with args {tool_args}]")
-
-                # Continue conversation with tool results
-                if hasattr(content, 'text') and content.text:
-                    self.messages.append({
-                      "role": "assistant",
-                      "content": content.text
-                    })
-                self.messages.append({
-                    "role": "user", 
-                    "content": result.content
-                })
-
-                # Get next response from Claude
-                response = self.anthropic.messages.create(
-                    model="claude-3-5-sonnet-20241022",
-                    max_tokens=1000,
-                    messages=self.messages,
-                )
-
-                final_text.append(response.content[0].text)
-
-        return "\n".join(final_text)
+        # Keep calling Claude until it stops asking for tools
+        for _ in range(MAX_TOOL_ROUNDS):
+            async with open_message_stream(self.anthropic, **claude_params) as stream:
+                async for text in stream.text_stream:
+                    yield text
+                response = await stream.get_final_message()
+
+            if response.stop_reason != "tool_use":
+                break
+
+            # Tool calls are only complete once the message has finished streaming
+            tool_blocks = [content for content in response.content if content.type == 'tool_use']
+            for block in tool_blocks:
+                yield f"\n[Calling tool {block.name} with args {block.input}]\n"
+
+            # Execute all tool calls from this round concurrently
+            results = await asyncio.gather(*[
+                self.session.call_tool(block.name, block.input) for block in tool_blocks
+            ])
+
+            # Continue conversation with all tool results in a single turn
+            conversation.append({
+                "role": "assistant",
+                "content": response.content
+            })
+            conversation.append({
+                "role": "user",
+                "content": [{
+                    "type": "tool_result",
+                    "tool_use_id": block.id,
+                    "content": self._tool_result_content(result)
+                } for block, result in zip(tool_blocks, results)]
+            })
+        else:
+            # Claude still wants tools after MAX_TOOL_ROUNDS, so have it answer from what it has
+            claude_params["tool_choice"] = {"type": "none"}
+            async with open_message_stream(self.anthropic, **claude_params) as stream:
+                async for text in stream.text_stream:
+                    yield text
 
     async def chat_loop(self):
         """Run an interactive chat loop"""
@@ -168,22 +253,37 @@ class MCPClient:
         """Clean up resources"""
         if self.exit_stack:
             await self.exit_stack.aclose()
-            self.exit_stack = AsyncExitStack()
+            self.exit_stack = None
             self.session = None
             self.stdio = None
             self.write = None
+            self._available_tools = []
+
+    async def reset(self):
+        """Close the connection and clear all per-session state so the client can reconnect"""
+        await self.cleanup()
+        self.messages = []
+        self._system_blocks = {}
+
+    async def __aenter__(self) -> "MCPClient":
+        if not self.server_script_path:
+            raise ValueError("A server script path is required to use MCPClient as a context manager")
+        await self.connect_to_server(self.server_script_path)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.cleanup()
 
 async def main():
     if len(sys.argv) < 2:
         print("Usage: python client.py <path_to_server_script>")
         sys.exit(1)
         
-    client = MCPClient()
     try:
-        await client.connect_to_server(sys.argv[1])
-        await client.chat_loop()
+        async with MCPClient(sys.argv[1]) as client:
+            await client.chat_loop()
     finally:
-        await client.cleanup()
+        await close_anthropic_client()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main(), loop_factory=uvloop.new_event_loop if uvloop else None)
\ No newline at end of file
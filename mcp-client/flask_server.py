@@ -1,5 +1,7 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
+from flask.json.provider import JSONProvider
+import pydantic_core
 import asyncio
 import sys
 import os
@@ -7,57 +9,122 @@ import json
 from asgiref.sync import async_to_sync
 from datetime import datetime
 from client import MCPClient
+from anthropic_client import shared_anthropic, close_anthropic_client
 import atexit
 import signal
+import threading
 import traceback
 
+try:
+    import uvloop
+except ImportError:  # uvloop is optional (not available on Windows)
+    uvloop = None
+
 # Import GM Agent system
 from gm_agent import GMAgentManager
 from models import Trade, TradeProposal, TradeResponse
 
+class FastJSONProvider(JSONProvider):
+    """JSON provider backed by pydantic-core's Rust serializer
+    
+    Serializes pydantic models (e.g. Trade) directly, without a model_dump() round-trip.
+    """
+    def dumps(self, obj, **kwargs):
+        return pydantic_core.to_json(obj).decode()
+    
+    def loads(self, s, **kwargs):
+        return pydantic_core.from_json(s)
+
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app)  # Enable CORS for all routes
 mcp_client = None
 loop = None
-gm_manager = GMAgentManager()
+gm_manager = GMAgentManager(anthropic_client=shared_anthropic)
+
+def initialize_client(server_script_path: str):
+    """Start the shared MCP client on a long-lived background event loop"""
+    global mcp_client, loop
+    # The MCP stdio session is bound to the loop it was created on, so it gets
+    # its own loop instead of the per-request loops Flask uses for async views
+    loop = uvloop.new_event_loop() if uvloop else asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    
+    mcp_client = MCPClient()
+    asyncio.run_coroutine_threadsafe(mcp_client.connect_to_server(server_script_path), loop).result()
+    asyncio.run_coroutine_threadsafe(gm_manager.startup(), loop).result()
+    
+    atexit.register(cleanup_client)
+    signal.signal(signal.SIGTERM, signal_handler)
+
+async def run_on_client_loop(coro):
+    """Run a coroutine on the shared client loop and await its result
+    
+    MCP sessions and the pooled Anthropic client are bound to the loop they were first
+    used on, so all of the GM agents' async work runs there too. Routes check that the
+    loop is running first, since running the work on Flask's per-request loops instead
+    would leave the shared Anthropic client bound to a closed loop.
+    """
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+def iterate_on_client_loop(agen):
+    """Synchronously iterate an async generator that runs on the shared client loop"""
+    async def next_item():
+        return await agen.__anext__()
+    
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(next_item(), loop).result()
+            except StopAsyncIteration:
+                break
+    finally:
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
 
 def cleanup_client():
+    global mcp_client
     if mcp_client and loop:
-        loop.run_until_complete(mcp_client.cleanup())
+        try:
+            # Fold the trade journal into a full snapshot before exiting
+            asyncio.run_coroutine_threadsafe(
+                gm_manager.league_state.save_async(gm_manager.league_state_path), loop
+            ).result(timeout=10)
+            asyncio.run_coroutine_threadsafe(mcp_client.cleanup(), loop).result(timeout=10)
+            asyncio.run_coroutine_threadsafe(gm_manager.shutdown(), loop).result(timeout=10)
+            asyncio.run_coroutine_threadsafe(close_anthropic_client(), loop).result(timeout=10)
+        except Exception as e:
+            print(f"Error cleaning up MCP client: {str(e)}")
+        mcp_client = None
+        loop.call_soon_threadsafe(loop.stop)
 
 def signal_handler(signum, frame):
     cleanup_client()
     exit(0)
 
 @app.route('/api/chat/<team>', methods=['POST'])
-async def chat(team):
+def chat(team):
+    """Stream the GM's reply as server-sent events"""
     data = request.get_json()
-    client = MCPClient()
-    try:
-        await client.connect_to_server(sys.argv[1])
-        result = await client.process_query(data["messages"], team)
-    finally:
-        await client.cleanup()
+    if not mcp_client:
+        return jsonify({"error": "MCP client not initialized"}), 503
     
-    return jsonify({"response": result})
+    def generate():
+        try:
+            for text in iterate_on_client_loop(mcp_client.stream_query(data["messages"], team)):
+                yield f"data: {json.dumps({'text': text})}\n\n"
+        except Exception as e:
+            print(f"Error in chat: {str(e)}")
+            traceback.print_exc()
+            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+    
+    return Response(generate(), mimetype="text/event-stream")
 
 # New API endpoints for the trading system
 
 @app.route('/api/teams', methods=['GET'])
 def get_teams():
     """Get list of all NBA teams"""
-    teams = []
-    for abbr, team in gm_manager.league_state.teams.items():
-        teams.append({
-            "id": team.id,
-            "name": team.name,
-            "abbreviation": team.abbreviation,
-            "city": team.city,
-            "conference": team.conference,
-            "division": team.division
-        })
-    
-    return jsonify({"teams": teams})
+    return Response(gm_manager.get_teams_json(), mimetype="application/json")
 
 @app.route('/api/team/select', methods=['POST'])
 def select_team():
@@ -73,8 +140,7 @@ def select_team():
 @app.route('/api/team/roster/<team_abbr>', methods=['GET'])
 def get_team_roster(team_abbr):
     """Get a team's roster"""
-    roster = gm_manager.get_team_roster(team_abbr)
-    return jsonify(roster)
+    return Response(gm_manager.get_team_roster_json(team_abbr), mimetype="application/json")
 
 @app.route('/api/league/activity', methods=['GET'])
 def get_league_activity():
@@ -92,6 +158,9 @@ def get_league_activity():
 @app.route('/api/trade/propose', methods=['POST'])
 async def propose_trade():
     """Propose a trade to another team"""
+    if loop is None:
+        return jsonify({"success": False, "message": "MCP client not initialized"}), 503
+    
     try:
         data = request.get_json()
         
@@ -130,14 +199,14 @@ async def propose_trade():
         proposal = TradeProposal(trade=trade, message=message)
         
         # Process trade
-        response = await gm_manager.process_user_trade_proposal(proposal)
+        response = await run_on_client_loop(gm_manager.process_user_trade_proposal(proposal))
         
         return jsonify({
             "success": True,
             "trade_id": response.trade_id,
             "status": response.status,
             "message": response.message,
-            "counter_trade": response.counter_trade.model_dump() if response.counter_trade else None
+            "counter_trade": response.counter_trade
         })
     
     except Exception as e:
@@ -148,6 +217,9 @@ async def propose_trade():
 @app.route('/api/trade/respond', methods=['POST'])
 async def respond_to_trade():
     """Respond to a trade (accept/reject/counter)"""
+    if loop is None:
+        return jsonify({"success": False, "message": "MCP client not initialized"}), 503
+    
     try:
         data = request.get_json()
         
@@ -155,43 +227,45 @@ async def respond_to_trade():
         if not data.get('trade_id') or not data.get('action'):
             return jsonify({"success": False, "message": "Missing trade_id or action"})
         
+        # Other routes change the league state on the client loop, so this one does too
+        return jsonify(await run_on_client_loop(handle_trade_response(data)))
+    
+    except Exception as e:
+        print(f"Error in respond_to_trade: {str(e)}")
+        traceback.print_exc()
+        return jsonify({"success": False, "message": f"Server error: {str(e)}"})
+
+async def handle_trade_response(data: dict) -> dict:
+    """Apply the user's response to a trade and persist the changes it made"""
+    try:
         trade_id = data['trade_id']
         action = data['action']
         
         # Find the trade
-        trade = None
-        for t in gm_manager.league_state.trades:
-            if t.id == trade_id:
-                trade = t
-                break
+        trade = gm_manager.league_state.get_trade(trade_id)
         
         if not trade:
-            return jsonify({"success": False, "message": "Trade not found"})
+            return {"success": False, "message": "Trade not found"}
         
         # Process the response
         if action == 'accept':
             # Execute the trade
             success = gm_manager.league_state.execute_trade(trade)
             if success:
-                gm_manager.league_state.save(gm_manager.league_state_path)
-                return jsonify({"success": True, "message": "Trade accepted"})
+                return {"success": True, "message": "Trade accepted"}
             else:
-                return jsonify({"success": False, "message": "Failed to execute trade"})
+                return {"success": False, "message": "Failed to execute trade"}
                 
         elif action == 'reject':
             # Mark as rejected
-            for i, t in enumerate(gm_manager.league_state.trades):
-                if t.id == trade_id:
-                    gm_manager.league_state.trades[i].status = 'rejected'
-                    break
-                    
-            gm_manager.league_state.save(gm_manager.league_state_path)
-            return jsonify({"success": True, "message": "Trade rejected"})
+            gm_manager.league_state.set_trade_status(trade, 'rejected')
+            
+            return {"success": True, "message": "Trade rejected"}
             
         elif action == 'counter':
             # Create counter proposal
             if not data.get('counter_trade'):
-                return jsonify({"success": False, "message": "Missing counter trade data"})
+                return {"success": False, "message": "Missing counter trade data"}
                 
             counter_data = data['counter_trade']
             
@@ -208,15 +282,10 @@ async def respond_to_trade():
             )
             
             # Add to league state
-            gm_manager.league_state.trades.append(counter_trade)
+            gm_manager.league_state.add_trade(counter_trade)
             
             # Mark original trade as countered
-            for i, t in enumerate(gm_manager.league_state.trades):
-                if t.id == trade_id:
-                    gm_manager.league_state.trades[i].status = 'countered'
-                    break
-                    
-            gm_manager.league_state.save(gm_manager.league_state_path)
+            gm_manager.league_state.set_trade_status(trade, 'countered')
             
             # Process counter trade
             message = data.get('message', 'Counter proposal from user')
@@ -231,34 +300,40 @@ async def respond_to_trade():
                 # If accepted, execute the trade
                 if response.status == "accepted":
                     gm_manager.league_state.execute_trade(counter_trade)
-                    gm_manager.league_state.save(gm_manager.league_state_path)
                 
-                return jsonify({
+                return {
                     "success": True,
                     "trade_id": response.trade_id,
                     "status": response.status,
                     "message": response.message,
-                    "counter_trade": response.counter_trade.model_dump() if response.counter_trade else None
-                })
+                    "counter_trade": response.counter_trade
+                }
             else:
-                return jsonify({"success": False, "message": "Invalid target team"})
+                return {"success": False, "message": "Invalid target team"}
         else:
-            return jsonify({"success": False, "message": "Invalid action"})
-        
-    except Exception as e:
-        print(f"Error in respond_to_trade: {str(e)}")
-        traceback.print_exc()
-        return jsonify({"success": False, "message": f"Server error: {str(e)}"})
+            return {"success": False, "message": "Invalid action"}
+    finally:
+        # Persist all changes made by this request with a single write
+        await gm_manager.league_state.flush_async(gm_manager.league_state_path)
 
 @app.route('/api/league/simulate', methods=['POST'])
 async def simulate_league():
     """Simulate the league (agent-to-agent trades)"""
+    if loop is None:
+        return jsonify({"success": False, "message": "MCP client not initialized"}), 503
+    
     try:
         all_results = []
         
+        # Evaluate through the Message Batches API when requested (slower, but cheaper)
+        use_batch = request.args.get('batch', default='false').lower() == 'true'
+        
         # Run multiple cycles of agent-to-agent trades to generate more activity
         # for _ in range(3):  # Run 3 cycles each time
-        results = await gm_manager.run_agent_trade_cycle()
+        if use_batch:
+            results = await run_on_client_loop(gm_manager.run_agent_trade_cycle_batched())
+        else:
+            results = await run_on_client_loop(gm_manager.run_agent_trade_cycle())
         all_results.extend(results)
         
         # Format results
@@ -280,13 +355,13 @@ async def simulate_league():
                     "target_team": proposal.trade.team2,
                     "target_team_name": team2_name,
                     "message": proposal.message,
-                    "trade": proposal.trade.model_dump()
+                    "trade": proposal.trade
                 },
                 "response": {
                     "status": response.status,
                     "message": response.message,
                     "trade_id": response.trade_id,
-                    "counter_trade": response.counter_trade.model_dump() if response.counter_trade else None
+                    "counter_trade": response.counter_trade
                 }
             })
         
@@ -312,5 +387,11 @@ if __name__ == '__main__':
     from models import initialize_league
     initialize_league()
     
+    # Connect the shared MCP client once for all chat requests. The debug reloader also
+    # runs this block in its watcher process, which never serves requests, so only the
+    # serving process starts MCP servers and snapshots the league state on exit
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        initialize_client(sys.argv[1])
+    
     # Run the Flask server
     app.run(debug=True, port=5001)
\ No newline at end of file
@@ -1,29 +1,184 @@
 import asyncio
+import heapq
 import json
+import logging
 import os
 import random
+import re
+import time
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
 from models import LeagueState, Team, Player, Trade, TradeProposal, TradeResponse
-import sys
 from contextlib import AsyncExitStack
 from dotenv import load_dotenv
+import pydantic_core
 
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic
+from anthropic_client import shared_anthropic, create_message
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Initialize the Anthropic client with API key from environment
-anthropic = Anthropic()
+logger = logging.getLogger(__name__)
+
+CLAUDE_MODEL = "claude-3-5-sonnet-20241022"
+EVALUATION_SYSTEM_PROMPT = "You are an experienced NBA General Manager making trade decisions. Your response must be valid JSON."
+# Seconds between status checks while waiting on a message batch
+BATCH_POLL_INTERVAL = 10
+# Roster spots we want filled at each position
+IDEAL_POSITION_COUNTS = {"PG": 2, "SG": 2, "SF": 2, "PF": 2, "C": 2}
+# Seconds a Claude trade evaluation is reused for an identical trade
+EVALUATION_CACHE_TTL = 60
+# Random source for every agent decision; seed it to replay a simulation
+rng = random.Random()
+
+# Characters that matter when scanning for a JSON object in free text
+_JSON_STRUCTURE = re.compile(r'[{}"\\]')
+
+def _extract_json_object(text: str) -> Optional[str]:
+    """Find the first balanced JSON object in text, ignoring braces inside strings"""
+    start = text.find("{")
+    if start == -1:
+        return None
+    
+    depth = 0
+    in_string = False
+    skip_until = -1
+    for match in _JSON_STRUCTURE.finditer(text, start):
+        pos = match.start()
+        if pos < skip_until:
+            continue  # escaped character
+        char = match.group()
+        if in_string:
+            if char == "\\":
+                skip_until = pos + 2
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:pos + 1]
+    return None
+
+# Prompt-ready JSON player cards, keyed by player ID; player details never change
+_player_cards: Dict[str, str] = {}
+
+def _player_card(player: Player) -> str:
+    """Get a player's details as a JSON card for evaluation prompts, serializing it only once"""
+    card = _player_cards.get(player.id)
+    if card is None:
+        data = {
+            "name": player.name, 
+            "position": player.position, 
+            "age": player.age,
+            "salary": f"${player.salary/1000000:.1f}M",
+            "contract_years": player.contract_years,
+            "stats": {k: f"{v:.1f}" for k, v in player.stats.items()}
+        }
+        # Indented as an element of a pretty-printed list
+        card = _player_cards[player.id] = "  " + json.dumps(data, indent=2).replace("\n", "\n  ")
+    return card
+
+def _format_players_for_prompt(players: List[Player]) -> str:
+    """Format players as a pretty-printed JSON list from their cached cards"""
+    if not players:
+        return "[]"
+    return "[\n" + ",\n".join(_player_card(p) for p in players) + "\n]"
+
+def _score_trade(
+    value_difference: float, salary_difference: float,
+    current_over_tax: bool, new_over_tax: bool, position_balance: Dict[str, int]
+) -> float:
+    """Adjust a trade's raw value difference for luxury tax and position balance"""
+    # Adjust for cap implications
+    if not current_over_tax and new_over_tax:
+        value_difference -= 10  # Big penalty for going into tax
+    elif current_over_tax and new_over_tax:
+        if salary_difference > 0:
+            value_difference -= salary_difference / 10_000_000  # Penalty for increasing tax bill
+        else:
+            value_difference += abs(salary_difference) / 10_000_000  # Bonus for reducing tax bill
+    
+    # Adjust for positional need
+    for balance in position_balance.values():
+        if balance < 0:  # We're short at this position after trade
+            value_difference -= abs(balance) * 5
+        elif balance > 1:  # We have too many at this position
+            value_difference -= (balance - 1) * 3
+    
+    return value_difference
+
+class MCPRegistry:
+    """Single NBA MCP server session shared by every GM agent"""
+    _lock: Optional[asyncio.Lock] = None
+    _exit_stack: Optional[AsyncExitStack] = None
+    _session: Optional[ClientSession] = None
+    _tools: Optional[List[Dict[str, Any]]] = None
+    
+    @classmethod
+    async def get_session(cls, server_script_path: str = "nba_server.py") -> ClientSession:
+        """Get the shared session, starting the MCP server on first use"""
+        if cls._lock is None:
+            cls._lock = asyncio.Lock()
+        
+        # Serialize startup so concurrent agents don't each spawn a server
+        async with cls._lock:
+            if cls._session is None:
+                server_params = StdioServerParameters(
+                    command="python",
+                    args=[server_script_path],
+                    env=None
+                )
+                
+                exit_stack = AsyncExitStack()
+                try:
+                    stdio, write = await exit_stack.enter_async_context(stdio_client(server_params))
+                    session = await exit_stack.enter_async_context(ClientSession(stdio, write))
+                    await session.initialize()
+                except BaseException:
+                    await exit_stack.aclose()
+                    raise
+                
+                cls._exit_stack, cls._session = exit_stack, session
+                logger.debug("Connected to MCP server %s", server_script_path)
+        
+        return cls._session
+    
+    @classmethod
+    async def get_tools(cls) -> List[Dict[str, Any]]:
+        """Get the shared session's tools in Claude's format, listing them only once"""
+        if cls._tools is None and cls._session is not None:
+            # Agents evaluating at the same time wait for a single list_tools call
+            async with cls._lock:
+                if cls._tools is None and cls._session is not None:
+                    response = await cls._session.list_tools()
+                    cls._tools = [{ 
+                        "name": tool.name,
+                        "description": tool.description,
+                        "input_schema": tool.inputSchema
+                    } for tool in response.tools]
+        return cls._tools or []
+    
+    @classmethod
+    async def close(cls):
+        """Shut down the shared MCP server session"""
+        if cls._exit_stack:
+            await cls._exit_stack.aclose()
+        cls._exit_stack = cls._session = cls._tools = None
 
 class GMAgent:
-    def __init__(self, team_abbr: str, league_state: LeagueState):
-        # MCP session for accessing NBA API tools
+    def __init__(self, team_abbr: str, league_state: LeagueState, anthropic_client: Optional[AsyncAnthropic] = None):
+        # Claude client, shared between agents so they use one connection pool
+        self.anthropic = anthropic_client or shared_anthropic
+        
+        # MCP session for accessing NBA API tools, shared through MCPRegistry
         self.mcp_session = None
-        self.exit_stack = AsyncExitStack()
         self.team_abbr = team_abbr
         self.league_state = league_state
         self.team = league_state.get_team_by_abbreviation(team_abbr)
@@ -31,77 +186,117 @@ class GMAgent:
         self.last_trade_check = datetime.now()
         self.trading_cool_down = 30  # seconds - reduced to encourage more trades
         
-        # Trade strategies and preferences
-        self.needs = self._analyze_team_needs()
+        # Player values for the current team needs, keyed by player ID
+        self._player_values: Dict[str, float] = {}
+        
+        # Recent Claude evaluations: trade key -> (time evaluated, evaluation)
+        self._evaluation_cache: Dict[tuple, tuple[float, Dict[str, Any]]] = {}
+        
+        # Trade strategies and preferences, re-analyzed whenever the roster changes
+        self.needs: Dict[str, float] = {}
+        self._need_factors: Dict[str, float] = {}
+        self._needed_positions: List[tuple[str, float]] = []
+        self._needs_version: Optional[int] = None
+        self._refresh_needs()
         
     def _analyze_team_needs(self) -> Dict[str, float]:
         """Analyze team needs based on roster composition"""
-        positions = {
-            "PG": 0, "SG": 0, "SF": 0, "SF": 0, "PF": 0, "C": 0
-        }
-        
-        # Count players by position
-        for player in self.team.players:
-            if player.position in positions:
-                positions[player.position] += 1
+        counts = self.team.position_counts()
         
         # Calculate needs (lower value = higher need)
         needs = {}
-        ideal_counts = {"PG": 2, "SG": 2, "SF": 2, "PF": 2, "C": 2}
-        
-        for pos, count in positions.items():
-            ideal = ideal_counts.get(pos, 2)
-            needs[pos] = (count / ideal) if ideal > 0 else 1.0
+        for pos, ideal in IDEAL_POSITION_COUNTS.items():
+            needs[pos] = (counts.get(pos, 0) / ideal) if ideal > 0 else 1.0
             
         return needs
     
+    def _refresh_needs(self) -> Dict[str, float]:
+        """Get the team needs, re-analyzing them only if the roster changed"""
+        if self._needs_version != self.team.roster_version:
+            self.needs = self._analyze_team_needs()
+            # If needs[position] is low, we need this position more
+            self._need_factors = {pos: 2.0 - need for pos, need in self.needs.items()}
+            # Positions ordered from most to least needed
+            self._needed_positions = sorted(self.needs.items(), key=lambda x: x[1])
+            self._needs_version = self.team.roster_version
+            # Player values depend on needs, so cached ones are stale
+            self._player_values.clear()
+        return self.needs
+    
     def evaluate_player(self, player: Player) -> float:
         """Evaluate a player's value based on stats, salary, and team needs"""
-        # Basic value from stats
-        ppg = player.stats.get("ppg", 0)
-        rpg = player.stats.get("rpg", 0)
-        apg = player.stats.get("apg", 0)
-        
-        # Base value from raw stats
-        base_value = ppg * 1.0 + rpg * 0.7 + apg * 0.7
-        
-        # Adjust for position need
-        position_need_factor = 1.0
-        if player.position in self.needs:
-            # If needs[position] is low, we need this position more
-            position_need_factor = 2.0 - self.needs[player.position]
-        
-        # Age factor (prime years 24-29)
-        age_factor = 1.0
-        if player.age < 23:
-            age_factor = 0.8 + (player.age - 19) * 0.05  # potential upside
-        elif 24 <= player.age <= 29:
-            age_factor = 1.0  # prime years
-        else:
-            age_factor = 1.0 - (player.age - 30) * 0.05  # declining value
+        return self._evaluate_players([player])[0]
+    
+    def _evaluate_players(self, players: List[Player]) -> List[float]:
+        """Evaluate several players in a single pass, sharing lookups between them"""
+        need_factors = self._need_factors
+        values = []
+        for player in players:
+            # Basic value from stats
+            stats = player.stats
+            ppg = stats.get("ppg", 0)
+            rpg = stats.get("rpg", 0)
+            apg = stats.get("apg", 0)
             
-        # Contract factor
-        # Shorter contracts are more valuable (flexibility)
-        contract_factor = 1.0 - (player.contract_years - 1) * 0.05
-        
-        # Salary efficiency (value per dollar)
-        # Higher value = better efficiency
-        salary_million = player.salary / 1_000_000
-        if salary_million > 0:
-            salary_efficiency = base_value / salary_million
-        else:
-            salary_efficiency = base_value
+            # Base value from raw stats
+            base_value = ppg * 1.0 + rpg * 0.7 + apg * 0.7
             
-        # Normalize salary efficiency (0.5 to 1.5)
-        normalized_efficiency = min(max(salary_efficiency / 10, 0.5), 1.5)
-        
-        # Calculate final value
-        value = base_value * position_need_factor * age_factor * contract_factor * normalized_efficiency
+            # Adjust for position need
+            position_need_factor = need_factors.get(player.position, 1.0)
+            
+            # Age factor (prime years 24-29)
+            age = player.age
+            if age < 23:
+                age_factor = 0.8 + (age - 19) * 0.05  # potential upside
+            elif 24 <= age <= 29:
+                age_factor = 1.0  # prime years
+            else:
+                age_factor = 1.0 - (age - 30) * 0.05  # declining value
+                
+            # Contract factor
+            # Shorter contracts are more valuable (flexibility)
+            contract_factor = 1.0 - (player.contract_years - 1) * 0.05
+            
+            # Salary efficiency (value per dollar)
+            # Higher value = better efficiency
+            salary_million = player.salary / 1_000_000
+            salary_efficiency = base_value / salary_million if salary_million > 0 else base_value
+                
+            # Normalize salary efficiency (0.5 to 1.5)
+            normalized_efficiency = min(max(salary_efficiency / 10, 0.5), 1.5)
+            
+            # Calculate final value
+            values.append(base_value * position_need_factor * age_factor * contract_factor * normalized_efficiency)
         
+        return values
+    
+    def _evaluate_roster(self, players: List[Player]) -> List[float]:
+        """Get the values of a group of players, evaluating any uncached players together"""
+        missing = [p for p in players if p.id not in self._player_values]
+        if missing:
+            self._player_values.update(zip((p.id for p in missing), self._evaluate_players(missing)))
+        return [self._player_values[p.id] for p in players]
+    
+    def _player_value(self, player: Player) -> float:
+        """Get a player's value to us, evaluating each player at most once per decision"""
+        value = self._player_values.get(player.id)
+        if value is None:
+            value = self._player_values[player.id] = self.evaluate_player(player)
         return value
     
+    def _pick_middle_value_player(self, players: List[Player]) -> Player:
+        """Pick the player a third of the way down a group, ranked by value to us
+        
+        Only the top third is ordered, rather than sorting the whole group.
+        """
+        index = min(len(players) - 1, len(players) // 3)
+        ranked = heapq.nlargest(index + 1, zip(self._evaluate_roster(players), players), key=lambda x: x[0])
+        return ranked[index][1]
+    
     def evaluate_trade(self, trade: Trade) -> Dict[str, Any]:
         """Evaluate a trade proposal from another team"""
+        self._refresh_needs()
+        
         # Determine which side we're on
         our_side = 1 if trade.team1 == self.team_abbr else 2
         our_players_ids = trade.team1_players if our_side == 1 else trade.team2_players
@@ -109,19 +304,23 @@ class GMAgent:
         other_team_abbr = trade.team2 if our_side == 1 else trade.team1
         
         # Get the actual player objects
-        our_players = [p for p in self.team.players if p.id in our_players_ids]
+        our_players = self.team.get_players(our_players_ids)
         other_team = self.league_state.get_team_by_abbreviation(other_team_abbr)
-        their_players = [p for p in other_team.players if p.id in their_players_ids]
+        their_players = other_team.get_players(their_players_ids)
         
-        # Calculate value of our players in the trade
-        our_value = sum(self.evaluate_player(player) for player in our_players)
+        # Calculate value and salary of our players in the trade
+        our_value = our_salary_out = 0
+        for player in our_players:
+            our_value += self._player_value(player)
+            our_salary_out += player.salary
         
-        # Calculate value of their players for our team
-        their_value_to_us = sum(self.evaluate_player(player) for player in their_players)
+        # Calculate value of their players for our team, and the salary we take on
+        their_value_to_us = their_salary_in = 0
+        for player in their_players:
+            their_value_to_us += self._player_value(player)
+            their_salary_in += player.salary
         
         # Calculate salary impact
-        our_salary_out = sum(p.salary for p in our_players)
-        their_salary_in = sum(p.salary for p in their_players)
         salary_difference = their_salary_in - our_salary_out
         
         # Salary cap and luxury tax considerations
@@ -136,15 +335,15 @@ class GMAgent:
             "new_over_tax": new_salary > self.team.luxury_tax,
         }
         
-        # Evaluate position balance after trade
-        new_position_count = {
-            "PG": 0, "SG": 0, "SF": 0, "PF": 0, "C": 0
-        }
+        # Evaluate position balance after trade, starting from the current roster
+        current_counts = self.team.position_counts()
+        new_position_count = {pos: current_counts.get(pos, 0) for pos in IDEAL_POSITION_COUNTS}
         
-        # Count current positions excluding our players in the trade
-        for player in self.team.players:
-            if player.id not in our_players_ids and player.position in new_position_count:
-                new_position_count[player.position] += 1
+        # Remove positions of our players in the trade
+        for player_id in set(our_players_ids):
+            player = self.team.get_player(player_id)
+            if player and player.position in new_position_count:
+                new_position_count[player.position] -= 1
         
         # Add positions from players we would receive
         for player in their_players:
@@ -152,32 +351,15 @@ class GMAgent:
                 new_position_count[player.position] += 1
         
         # Determine position imbalance
-        position_balance = {}
-        ideal_counts = {"PG": 2, "SG": 2, "SF": 2, "PF": 2, "C": 2}
-        
-        for pos, count in new_position_count.items():
-            ideal = ideal_counts.get(pos, 2)
-            balance = count - ideal
-            position_balance[pos] = balance
-        
-        # Calculate overall trade value
-        value_difference = their_value_to_us - our_value
-        
-        # Adjust for cap implications
-        if not cap_status["current_over_tax"] and cap_status["new_over_tax"]:
-            value_difference -= 10  # Big penalty for going into tax
-        elif cap_status["current_over_tax"] and cap_status["new_over_tax"]:
-            if salary_difference > 0:
-                value_difference -= salary_difference / 10_000_000  # Penalty for increasing tax bill
-            else:
-                value_difference += abs(salary_difference) / 10_000_000  # Bonus for reducing tax bill
+        position_balance = {
+            pos: count - IDEAL_POSITION_COUNTS.get(pos, 2) for pos, count in new_position_count.items()
+        }
         
-        # Adjust for positional need
-        for pos, balance in position_balance.items():
-            if balance < 0:  # We're short at this position after trade
-                value_difference -= abs(balance) * 5
-            elif balance > 1:  # We have too many at this position
-                value_difference -= (balance - 1) * 3
+        # Calculate overall trade value, adjusted for tax and roster balance
+        value_difference = _score_trade(
+            their_value_to_us - our_value, salary_difference,
+            cap_status["current_over_tax"], cap_status["new_over_tax"], position_balance
+        )
         
         # Return detailed evaluation
         return {
@@ -213,6 +395,8 @@ class GMAgent:
     
     def create_counter_offer(self, original_trade: Trade) -> Optional[Trade]:
         """Create a counter offer to an unfavorable trade"""
+        self._refresh_needs()
+        
         # Determine which side we're on
         our_side = 1 if original_trade.team1 == self.team_abbr else 2
         other_team_abbr = original_trade.team2 if our_side == 1 else original_trade.team1
@@ -238,28 +422,13 @@ class GMAgent:
             our_players_ids = counter.team2_players
             their_players_ids = counter.team1_players
         
-        # Evaluate their players
-        their_players = [p for p in other_team.players if p.id in their_players_ids]
-        their_value = sum(self.evaluate_player(player) for player in their_players)
-        
-        # Find our players not in the trade
-        our_available_players = [p for p in self.team.players if p.id not in our_players_ids]
-        
-        # Sort by value (ascending)
-        our_available_players.sort(key=self.evaluate_player)
-        
-        # Current trade value
-        our_players = [p for p in self.team.players if p.id in our_players_ids]
-        our_value = sum(self.evaluate_player(player) for player in our_players)
-        
         # Target: remove one of our higher-value players or add one of their lower-value players
-        if len(our_players_ids) > 0 and random.random() < 0.7:
+        if len(our_players_ids) > 0 and rng.random() < 0.7:
             # Try removing one of our players from the trade
-            our_players_in_trade = sorted([(p, self.evaluate_player(p)) for p in our_players], 
-                                         key=lambda x: x[1], reverse=True)
+            our_players = self.team.get_players(our_players_ids)
             
-            if our_players_in_trade:
-                player_to_remove, _ = our_players_in_trade[0]  # Highest value player
+            if our_players:
+                player_to_remove = max(our_players, key=self._player_value)  # Highest value player
                 
                 # Remove from the right list
                 if our_side == 1:
@@ -268,23 +437,18 @@ class GMAgent:
                     counter.team2_players.remove(player_to_remove.id)
         else:
             # Try adding one of their players to the trade
-            their_available_players = [p for p in other_team.players if p.id not in their_players_ids]
+            their_trade_ids = set(their_players_ids)
+            their_available_players = [p for p in other_team.players if p.id not in their_trade_ids]
             
             if their_available_players:
-                # Sort by value (to us)
-                sorted_players = sorted([(p, self.evaluate_player(p)) for p in their_available_players], 
-                                      key=lambda x: x[1], reverse=True)
+                # Pick a player in the middle-to-lower range (by value to us) to be reasonable
+                player_to_add = self._pick_middle_value_player(their_available_players)
                 
-                if sorted_players:
-                    # Pick a player in the middle-to-lower range to be reasonable
-                    index = min(len(sorted_players) - 1, len(sorted_players) // 3)
-                    player_to_add, _ = sorted_players[index]
-                    
-                    # Add to the right list
-                    if our_side == 1:
-                        counter.team2_players.append(player_to_add.id)
-                    else:
-                        counter.team1_players.append(player_to_add.id)
+                # Add to the right list
+                if our_side == 1:
+                    counter.team2_players.append(player_to_add.id)
+                else:
+                    counter.team1_players.append(player_to_add.id)
         
         # Check if the counter offer is different
         if ((our_side == 1 and counter.team1_players == original_trade.team1_players and 
@@ -298,17 +462,18 @@ class GMAgent:
     def generate_trade_proposal(self, target_team_abbr: str) -> Optional[TradeProposal]:
         """Generate a new trade proposal targeting another team"""
         target_team = self.league_state.get_team_by_abbreviation(target_team_abbr)
-
-        print(target_team, file=sys.stderr)
         
         if not target_team:
             return None
         
         # Analyze our needs
-        our_needs = self._analyze_team_needs()
+        our_needs = self._refresh_needs()
         
         # Find positions we need most
-        needed_positions = sorted(our_needs.items(), key=lambda x: x[1])
+        needed_positions = self._needed_positions
+        
+        # Value their roster up front in one pass
+        self._evaluate_roster(target_team.players)
         
         # Start with an empty trade
         trade = Trade(
@@ -321,44 +486,36 @@ class GMAgent:
         target_players = []
         
         # Debug team info
-        print(f"Target team: {target_team_abbr}, players: {len(target_team.players)}")
-        print(f"Our needs: {our_needs}")
+        logger.debug("Target team: %s, players: %d", target_team_abbr, len(target_team.players))
+        logger.debug("Our needs: %s", our_needs)
         
         # The 0.8 threshold is too strict - relax it to 1.5
         for position, need_value in needed_positions[:2]:  # Focus on top 2 needs
-            print(f"Checking position {position} with need value {need_value}")
+            logger.debug("Checking position %s with need value %s", position, need_value)
             # Accept any position with a need value under 1.5 (instead of 0.8)
             if need_value < 1.5:
-                matching_players = [
-                    p for p in target_team.players 
-                    # Always consider players regardless of our cap space
-                    if p.position == position
-                ]
+                # Always consider players regardless of our cap space
+                matching_players = target_team.players_at_position(position)
                 
-                print(f"Found {len(matching_players)} matching players for position {position}")
+                logger.debug("Found %d matching players for position %s", len(matching_players), position)
                 
                 if matching_players:
-                    # Sort by our evaluation of their value
-                    matching_players.sort(key=self.evaluate_player, reverse=True)
-                    # Take best player that fits
-                    target_players.append(matching_players[0])
+                    # Take the best player that fits, by our evaluation of their value
+                    target_players.append(max(matching_players, key=self._player_value))
         
         # If no positional needs found, just look for value
         if not target_players:
-            print("No positional matches, looking for value")
+            logger.debug("No positional matches, looking for value")
             # Get any players from their team - don't limit by cap space
             affordable_players = target_team.players
             
             if affordable_players:
-                # Sort by value to limit to reasonable players
-                sorted_players = sorted(affordable_players, key=self.evaluate_player, reverse=True)
-                # Take a player from the middle range (don't take their best player)
-                idx = min(len(sorted_players) // 3, len(sorted_players) - 1)
-                target_players = [sorted_players[idx]]
-                print(f"Selected player by value: {sorted_players[idx].name}")
+                # Take a player from the middle range by value (don't take their best player)
+                target_players = [self._pick_middle_value_player(affordable_players)]
+                logger.debug("Selected player by value: %s", target_players[0].name)
         
         if not target_players:
-            print("no suitable players found", file=sys.stderr)
+            logger.debug("No suitable players found on %s", target_team_abbr)
             return None  # No suitable players found
         
         # Calculate incoming salary
@@ -369,24 +526,29 @@ class GMAgent:
         # Aim for a reasonable match but don't be too strict
         target_outgoing_salary = max(incoming_salary * 0.7, 1000000)  # At least $1M but try for 70% match
         
-        print(f"Incoming salary: ${incoming_salary/1000000:.1f}M, Target outgoing: ${target_outgoing_salary/1000000:.1f}M")
+        logger.debug(
+            "Incoming salary: $%.1fM, Target outgoing: $%.1fM",
+            incoming_salary / 1000000, target_outgoing_salary / 1000000
+        )
         
         # Sort our players by value (ascending)
-        our_sorted_players = sorted(self.team.players, key=self.evaluate_player)
+        our_sorted_players = sorted(
+            zip(self._evaluate_roster(self.team.players), self.team.players), key=lambda x: x[0]
+        )
         
-        # Print our players for debugging
-        print(f"Our team has {len(our_sorted_players)} players available")
+        # Log our players for debugging
+        logger.debug("Our team has %d players available", len(our_sorted_players))
         
         # Always include at least one player regardless of value
         current_salary = 0
-        for player in our_sorted_players:
+        for value, player in our_sorted_players:
             # Skip super high value players but be more generous with threshold
-            if self.evaluate_player(player) > 50:  # Increased from 30 to 50
+            if value > 50:  # Increased from 30 to 50
                 continue
                 
             our_players.append(player)
             current_salary += player.salary
-            print(f"Adding {player.name} with salary ${player.salary/1000000:.1f}M to trade")
+            logger.debug("Adding %s with salary $%.1fM to trade", player.name, player.salary / 1000000)
             
             # Add at least one player but stop if we've reached salary target
             if len(our_players) >= 1 and current_salary >= target_outgoing_salary:
@@ -394,13 +556,13 @@ class GMAgent:
         
         # If we couldn't find any players, take the lowest value player
         if not our_players and our_sorted_players:
-            player = our_sorted_players[0]
+            _, player = our_sorted_players[0]
             our_players.append(player)
             current_salary = player.salary
-            print(f"Falling back to lowest value player: {player.name} with salary ${player.salary/1000000:.1f}M")
+            logger.debug("Falling back to lowest value player: %s with salary $%.1fM", player.name, player.salary / 1000000)
         
         # Always allow trades to proceed - don't be too strict
-        print(f"Final outgoing salary: ${current_salary/1000000:.1f}M")
+        logger.debug("Final outgoing salary: $%.1fM", current_salary / 1000000)
         
         # Add players to trade
         for player in target_players:
@@ -422,32 +584,26 @@ class GMAgent:
     async def connect_to_mcp_server(self, server_script_path: str = "nba_server.py"):
         """Connect to the NBA MCP server for enhanced trade evaluations"""
         try:
-            server_params = StdioServerParameters(
-                command="python",
-                args=[server_script_path],
-                env=None
-            )
-            
-            stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
-            stdio, write = stdio_transport
-            self.mcp_session = await self.exit_stack.enter_async_context(ClientSession(stdio, write))
-            
-            await self.mcp_session.initialize()
-            print("reached the end, connected to MCP", self.mcp_session, file=sys.stderr)
+            self.mcp_session = await MCPRegistry.get_session(server_script_path)
             return True
         except Exception as e:
             print(f"Error connecting to MCP server: {e}")
             return False
     
     async def disconnect_from_mcp_server(self):
-        """Disconnect from the NBA MCP server"""
-        if self.exit_stack:
-            await self.exit_stack.aclose()
-            self.exit_stack = AsyncExitStack()
-            self.mcp_session = None
+        """Disconnect from the NBA MCP server; the shared session stays open for other agents"""
+        self.mcp_session = None
     
-    async def evaluate_trade_with_claude(self, trade: Trade) -> Dict[str, Any]:
-        """Use Claude to evaluate a trade in more detail"""
+    def build_evaluation_prompt(self, trade: Trade, local_evaluation: Optional[Dict[str, Any]] = None) -> str:
+        """Build the Claude prompt for evaluating a trade from our perspective
+        
+        Args:
+            trade: The trade to evaluate
+            local_evaluation: Result of evaluate_trade for this trade, computed if not given
+        """
+        if local_evaluation is None:
+            local_evaluation = self.evaluate_trade(trade)
+        
         # Determine which side we're on
         our_side = 1 if trade.team1 == self.team_abbr else 2
         our_players_ids = trade.team1_players if our_side == 1 else trade.team2_players
@@ -459,63 +615,25 @@ class GMAgent:
         other_team = self.league_state.get_team_by_abbreviation(other_team_abbr)
         
         # Get the actual player objects
-        our_players = [p for p in our_team.players if p.id in our_players_ids]
-        their_players = [p for p in other_team.players if p.id in their_players_ids]
+        our_players = our_team.get_players(our_players_ids)
+        their_players = other_team.get_players(their_players_ids)
         
         # Format player data
-        our_players_data = [
-            {
-                "name": p.name, 
-                "position": p.position, 
-                "age": p.age,
-                "salary": f"${p.salary/1000000:.1f}M",
-                "contract_years": p.contract_years,
-                "stats": {k: f"{v:.1f}" for k, v in p.stats.items()}
-            } 
-            for p in our_players
-        ]
-        
-        their_players_data = [
-            {
-                "name": p.name, 
-                "position": p.position, 
-                "age": p.age,
-                "salary": f"${p.salary/1000000:.1f}M",
-                "contract_years": p.contract_years,
-                "stats": {k: f"{v:.1f}" for k, v in p.stats.items()}
-            } 
-            for p in their_players
-        ]
-        
-        # Try to connect to the MCP server if not already connected
-        have_mcp_tools = False
-        available_tools = []
-        if not self.mcp_session:
-            connected = await self.connect_to_mcp_server()
-        if self.mcp_session:
-            try:
-                # Get available tools from MCP server
-                response = await self.mcp_session.list_tools()
-                available_tools = [{ 
-                    "name": tool.name,
-                    "description": tool.description,
-                    "input_schema": tool.inputSchema
-                } for tool in response.tools]
-                have_mcp_tools = len(available_tools) > 0
-            except Exception as e:
-                print(f"Error listing MCP tools: {e}")
+        our_players_data = _format_players_for_prompt(our_players)
+        their_players_data = _format_players_for_prompt(their_players)
         
         # Create prompt for Claude
         prompt = f"""You are the General Manager of the {our_team.city} {our_team.name}. 
 You're considering a trade with the {other_team.city} {other_team.name}.
 
 In this trade:
-You send: {json.dumps(our_players_data, indent=2)}
+You send: {our_players_data}
 
-You receive: {json.dumps(their_players_data, indent=2)}
+You receive: {their_players_data}
 
-Your current team needs are: {self._analyze_team_needs()}
+Your current team needs are: {self._refresh_needs()}
 Your current salary situation: ${our_team.total_salary()/1000000:.1f}M (Cap: ${our_team.salary_cap/1000000:.1f}M, Tax: ${our_team.luxury_tax/1000000:.1f}M)
+Your scouting model rates this trade at {local_evaluation["value_difference"]:+.1f} for your team (positive favors you; above -5 is generally acceptable)
 
 Evaluate this trade from your perspective. Consider:
 1. Player value and team fit
@@ -531,6 +649,63 @@ Then respond in the following JSON format:
     "reasoning": Your reasoning in 2-3 sentences,
     "message": What you would tell the other GM
 }}"""
+        
+        return prompt
+    
+    def parse_evaluation(self, text_response: str) -> Dict[str, Any]:
+        """Extract the JSON evaluation from Claude's response text"""
+        try:
+            json_str = _extract_json_object(text_response)
+            if json_str is None:
+                raise ValueError("No JSON object in response")
+            return pydantic_core.from_json(json_str)
+        except ValueError:
+            # Fallback to basic evaluation if parsing fails
+            return {
+                "decision": "reject" if rng.random() < 0.7 else "counter",
+                "value_for_us": rng.randint(3, 6),
+                "value_for_them": rng.randint(5, 8),
+                "reasoning": "Failed to parse Claude's response, using fallback evaluation.",
+                "message": "I've considered your offer, but I don't think it works for our team right now.",
+                "fallback": True
+            }
+    
+    def _evaluation_key(self, trade: Trade) -> tuple:
+        """Key identifying a trade and the rosters it was evaluated against"""
+        other_team = self.league_state.get_team_by_abbreviation(
+            trade.team2 if trade.team1 == self.team_abbr else trade.team1
+        )
+        return (
+            trade.team1, trade.team2,
+            frozenset(trade.team1_players), frozenset(trade.team2_players),
+            self.team.roster_version, other_team.roster_version if other_team else None
+        )
+    
+    async def evaluate_trade_with_claude(self, trade: Trade) -> Dict[str, Any]:
+        """Use Claude to evaluate a trade in more detail"""
+        # Reuse a recent evaluation of the same trade against the same rosters
+        cache_key = self._evaluation_key(trade)
+        cached = self._evaluation_cache.get(cache_key)
+        if cached and time.monotonic() - cached[0] < EVALUATION_CACHE_TTL:
+            return dict(cached[1])
+        
+        # Rule-based evaluation, used as context for Claude and as the fallback
+        local_evaluation = self.evaluate_trade(trade)
+        prompt = self.build_evaluation_prompt(trade, local_evaluation)
+        
+        # Try to connect to the MCP server if not already connected
+        have_mcp_tools = False
+        available_tools = []
+        if not self.mcp_session:
+            connected = await self.connect_to_mcp_server()
+        if self.mcp_session:
+            try:
+                # Get available tools from MCP server
+                available_tools = await MCPRegistry.get_tools()
+                have_mcp_tools = len(available_tools) > 0
+            except Exception as e:
+                print(f"Error listing MCP tools: {e}")
+        
 
         try:
             # Set up messages for Claude
@@ -541,22 +716,22 @@ Then respond in the following JSON format:
             
             # Create parameters for Claude API call
             claude_params = {
-                "model": "claude-3-5-sonnet-20241022",
+                "model": CLAUDE_MODEL,
                 "max_tokens": 1000,
                 "temperature": 0.7,
-                "system": "You are an experienced NBA General Manager making trade decisions. Your response must be valid JSON.",
+                "system": EVALUATION_SYSTEM_PROMPT,
                 "messages": messages
             }
             
             # Add available tools if we have them
-            print("do i have mcp", have_mcp_tools, file=sys.stderr)
+            logger.debug("Evaluating with MCP tools: %s", have_mcp_tools)
             if have_mcp_tools:
                 claude_params["tools"] = available_tools
             
             # Call Claude with or without tools
-            response = anthropic.messages.create(**claude_params)
+            response = await create_message(self.anthropic, **claude_params)
 
-            print("called claude!1!", file=sys.stderr)
+            logger.debug("Received Claude evaluation for trade %s", trade.id)
             
             # Process response and handle tool calls
             tool_results = []
@@ -569,7 +744,7 @@ Then respond in the following JSON format:
                     tool_name = content.name
                     tool_args = content.input
 
-                    print("calling tool", tool_name, file=sys.stderr)
+                    logger.debug("Calling tool %s", tool_name)
                     
                     # Execute tool call through MCP
                     try:
@@ -582,11 +757,12 @@ Then respond in the following JSON format:
                         messages.append({"role": "user", "content": result.content})
                         
                         # Get next response from Claude
-                        follow_up = anthropic.messages.create(
-                            model="claude-3-5-sonnet-20241022",
+                        follow_up = await create_message(
+                            self.anthropic,
+                            model=CLAUDE_MODEL,
                             max_tokens=1000,
                             temperature=0.7,
-                            system="You are an experienced NBA General Manager making trade decisions. Your response must be valid JSON.",
+                            system=EVALUATION_SYSTEM_PROMPT,
                             messages=messages
                         )
                         
@@ -599,39 +775,38 @@ Then respond in the following JSON format:
             text_response = final_text[-1] if final_text else ""
             
             # Extract JSON
-            try:
-                json_start = text_response.find("{")
-                json_end = text_response.rfind("}") + 1
-                json_str = text_response[json_start:json_end]
-                result = json.loads(json_str)
-                return result
-            except (json.JSONDecodeError, ValueError):
-                # Fallback to basic evaluation if parsing fails
-                return {
-                    "decision": "reject" if random.random() < 0.7 else "counter",
-                    "value_for_us": random.randint(3, 6),
-                    "value_for_them": random.randint(5, 8),
-                    "reasoning": "Failed to parse Claude's response, using fallback evaluation.",
-                    "message": "I've considered your offer, but I don't think it works for our team right now."
-                }
+            evaluation = self.parse_evaluation(text_response)
+            # Don't pin the random fallback verdict for an unparseable reply
+            if evaluation.get("fallback"):
+                return evaluation
+            
+            now = time.monotonic()
+            self._evaluation_cache = {
+                key: entry for key, entry in self._evaluation_cache.items()
+                if now - entry[0] < EVALUATION_CACHE_TTL
+            }
+            self._evaluation_cache[cache_key] = (now, evaluation)
+            return dict(evaluation)
                 
         except Exception as e:
             print(f"Error querying Claude: {e}")
             # Fallback to basic evaluation
-            eval_result = self.evaluate_trade(trade)
             return {
-                "decision": "accept" if eval_result["acceptable"] else "reject",
-                "value_for_us": 7 if eval_result["acceptable"] else 4,
+                "decision": "accept" if local_evaluation["acceptable"] else "reject",
+                "value_for_us": 7 if local_evaluation["acceptable"] else 4,
                 "value_for_them": 6,
-                "reasoning": eval_result["reasoning"],
-                "message": "Thanks for the offer, but it's not the right fit for our team." if not eval_result["acceptable"] else "This looks like a deal that works for both sides."
+                "reasoning": local_evaluation["reasoning"],
+                "message": "Thanks for the offer, but it's not the right fit for our team." if not local_evaluation["acceptable"] else "This looks like a deal that works for both sides."
             }
     
     async def respond_to_trade(self, trade: Trade) -> TradeResponse:
         """Generate a response to a trade proposal"""
         # Use Claude to evaluate the trade
         evaluation = await self.evaluate_trade_with_claude(trade)
-        
+        return self.build_trade_response(trade, evaluation)
+    
+    def build_trade_response(self, trade: Trade, evaluation: Dict[str, Any]) -> TradeResponse:
+        """Turn a trade evaluation into a response, creating a counter offer if needed"""
         decision = evaluation.get("decision", "reject")
         message = evaluation.get("message", "Thank you for your trade proposal.")
         
@@ -674,15 +849,15 @@ Then respond in the following JSON format:
         
         # Only initiate trades sometimes
         # Higher probability (0.7) to encourage more trades
-        if random.random() > 0.7:
+        if rng.random() > 0.7:
             return []
         
         # Get teams to potentially trade with
         other_teams = [abbr for abbr in self.league_state.teams.keys() if abbr != self.team_abbr]
         
         # Choose 2-3 random teams to consider trades with
-        num_teams = random.randint(2, 3)
-        target_teams = random.sample(other_teams, min(num_teams, len(other_teams)))
+        num_teams = rng.randint(2, 3)
+        target_teams = rng.sample(other_teams, min(num_teams, len(other_teams)))
         
         proposals = []
         for target_team in target_teams:
@@ -694,9 +869,16 @@ Then respond in the following JSON format:
 
 # Manager class to coordinate multiple GM agents
 class GMAgentManager:
-    def __init__(self, league_state_path: str = "league_state.json", mcp_server_path: str = "nba_server.py"):
+    def __init__(
+        self,
+        league_state_path: str = "league_state.json",
+        mcp_server_path: str = "nba_server.py",
+        anthropic_client: Optional[AsyncAnthropic] = None
+    ):
         self.league_state_path = league_state_path
         self.mcp_server_path = mcp_server_path
+        # One Claude client shared by every agent
+        self.anthropic = anthropic_client or shared_anthropic
         self.league_state = LeagueState.load(league_state_path)
         if not self.league_state.teams:
             from models import initialize_league
@@ -704,12 +886,29 @@ class GMAgentManager:
         
         # Create agents for each team
         self.agents = {
-            abbr: GMAgent(abbr, self.league_state)
+            abbr: GMAgent(abbr, self.league_state, self.anthropic)
             for abbr in self.league_state.teams.keys()
         }
         
         # User's selected team
         self.user_team = None
+        
+        # Serialized team list; team metadata never changes after initialization
+        self._teams_json: Optional[bytes] = None
+        
+        # Roster responses by team, with the roster version they were built from
+        self._rosters: Dict[str, tuple[int, Dict[str, Any], bytes]] = {}
+    
+    async def startup(self):
+        """Connect every agent to the MCP server up front so trades don't pay for it"""
+        await asyncio.gather(*[
+            agent.connect_to_mcp_server(self.mcp_server_path) for agent in self.agents.values()
+        ])
+    
+    async def shutdown(self):
+        """Disconnect every agent and close the shared MCP session"""
+        await asyncio.gather(*[agent.disconnect_from_mcp_server() for agent in self.agents.values()])
+        await MCPRegistry.close()
     
     def select_user_team(self, team_abbr: str):
         """Set the user's team"""
@@ -730,25 +929,10 @@ class GMAgentManager:
                 message="Invalid target team."
             )
         
-        # Add to league state
-        self.league_state.trades.append(trade)
-        
-        # Initialize MCP for target team agent if needed
-        target_agent = self.agents[target_team]
-        if not target_agent.mcp_session:
-            await target_agent.connect_to_mcp_server(self.mcp_server_path)
-        
-        # Let the target team's agent evaluate
-        response = await target_agent.respond_to_trade(trade)
-        
-        # If accepted, execute the trade
-        if response.status == "accepted":
-            self.league_state.execute_trade(trade)
-        elif response.status == "countered" and response.counter_trade:
-            self.league_state.trades.append(response.counter_trade)
+        response = await self._process_trade(trade, target_team)
         
         # Save league state
-        self.league_state.save(self.league_state_path)
+        await self.league_state.flush_async(self.league_state_path)
         
         return response
     
@@ -757,32 +941,39 @@ class GMAgentManager:
         trade = proposal.trade
         target_team = trade.team2 if trade.team1 == source_team else trade.team1
         
-        # Add to league state
-        self.league_state.trades.append(trade)
+        response = await self._process_trade(trade, target_team)
         
-        # Initialize MCP for target team agent if needed
-        target_agent = self.agents[target_team]
-        if not target_agent.mcp_session:
-            await target_agent.connect_to_mcp_server(self.mcp_server_path)
+        # Save league state
+        await self.league_state.flush_async(self.league_state_path)
+        
+        return response
+    
+    async def _process_trade(self, trade: Trade, target_team: str) -> TradeResponse:
+        """Record a trade, let the target team's agent respond, and act on the response
+        
+        The league state is not saved; callers flush it once they are done.
+        """
+        # Add to league state
+        self.league_state.add_trade(trade)
         
         # Let the target team's agent evaluate
-        response = await target_agent.respond_to_trade(trade)
+        response = await self.agents[target_team].respond_to_trade(trade)
+        
+        # Another trade may have moved some of these players while the agent was deciding
+        if response.status == "accepted" and not self._trade_players_available(trade):
+            return self._reject_stale_trade(trade)
         
         # If accepted, execute the trade
         if response.status == "accepted":
             self.league_state.execute_trade(trade)
         elif response.status == "countered" and response.counter_trade:
-            self.league_state.trades.append(response.counter_trade)
-        
-        # Save league state
-        self.league_state.save(self.league_state_path)
+            self.league_state.add_trade(response.counter_trade)
         
         return response
     
     async def run_agent_trade_cycle(self):
         """Run a cycle of agent-to-agent trade proposals"""
-
-        print("hey", file=sys.stderr)
+        logger.debug("Starting agent trade cycle")
         # Skip if user hasn't selected a team
         if not self.user_team:
             return []
@@ -792,32 +983,19 @@ class GMAgentManager:
         # Let agents initiate trades
         # Create a list of teams to process
         team_list = list(self.agents.keys())
-        random.shuffle(team_list)  # Randomize order for fairness
+        rng.shuffle(team_list)  # Randomize order for fairness
         
-        print("hey??", file=sys.stderr)
         # Process more teams to generate more trades
-        # TODO: consider removing this cap
-        for team_abbr in team_list[:1]:
-            # Skip user's team
-            if team_abbr == self.user_team:
-                continue
-            
-            # Consider initiating trades
-            agent = self.agents[team_abbr]
-            proposals = await agent.consider_initiating_trades()
-            
-            # TODO: consider removing this cap
-            for proposal in proposals[:1]:
-                # Process each proposal
-                try:
-                    response = await self.process_agent_trade_proposal(team_abbr, proposal)
-                    
-                    results.append({
-                        "proposal": proposal,
-                        "response": response
-                    })
-                except Exception as e:
-                    print(f"Error processing trade proposal from {team_abbr}: {str(e)}")
+        # TODO: consider removing these caps
+        pending = [
+            (proposal, target_agent)
+            for proposals in (await self._collect_proposals(team_list[:1])).values()
+            for proposal, target_agent in proposals[:1]
+        ]
+        
+        # Evaluate every proposal concurrently, then apply the responses in order
+        if pending:
+            results.extend(await self._respond_to_proposals(pending))
         
         # Force some AI-to-AI trades for better simulation
         # Let's make sure we have at least a few trades every cycle
@@ -826,59 +1004,230 @@ class GMAgentManager:
                 # Get two random teams
                 available_teams = [t for t in team_list if t != self.user_team]
                 if len(available_teams) >= 2:
-                    source_team = random.choice(available_teams)
-                    available_teams.remove(source_team)
-                    target_team = random.choice(available_teams)
+                    source_team, target_team = rng.sample(available_teams, 2)
                     
                     # Force a trade proposal (with additional logging)
-                    print(f"Forcing trade proposal from {source_team} to {target_team}")
+                    logger.debug("Forcing trade proposal from %s to %s", source_team, target_team)
                     proposal = self.agents[source_team].generate_trade_proposal(target_team)
                     if proposal:
-                        print(f"Generated proposal: {source_team} proposes trade to {target_team} with {len(proposal.trade.team1_players)} for {len(proposal.trade.team2_players)}")
-                        response = await self.process_agent_trade_proposal(source_team, proposal)
+                        logger.debug(
+                            "Generated proposal: %s proposes trade to %s with %d for %d",
+                            source_team, target_team, len(proposal.trade.team1_players), len(proposal.trade.team2_players)
+                        )
+                        response = await self._process_trade(proposal.trade, target_team)
                         results.append({
                             "proposal": proposal,
                             "response": response
                         })
-                        print(f"Trade response: {response.status}")
+                        logger.debug("Trade response: %s", response.status)
                     else:
-                        print(f"Failed to generate proposal from {source_team} to {target_team}")
+                        logger.debug("Failed to generate proposal from %s to %s", source_team, target_team)
             except Exception as e:
                 print(f"Error forcing AI-to-AI trade: {str(e)}")
         
+        # Save league state once for the whole cycle
+        await self.league_state.flush_async(self.league_state_path)
+        
         return results
     
+    async def run_agent_trade_cycle_batched(self):
+        """Run a cycle of agent-to-agent trade proposals, evaluated in one Message Batch
+        
+        Every agent's proposals are evaluated offline through the Message Batches API,
+        which is cheaper than live calls but can take minutes to complete. Use
+        run_agent_trade_cycle for interactive simulation.
+        """
+        # Skip if user hasn't selected a team
+        if not self.user_team:
+            return []
+        
+        # Collect every proposal along with the agent that has to evaluate it
+        pending = [
+            (proposal, target_agent)
+            for proposals in (await self._collect_proposals(list(self.agents))).values()
+            for proposal, target_agent in proposals
+            if target_agent.team_abbr != self.user_team
+        ]
+        
+        if not pending:
+            return []
+        
+        # Submit all evaluations as a single batch
+        requests = [
+            {
+                "custom_id": f"{i}_{target_agent.team_abbr}",
+                "params": {
+                    "model": CLAUDE_MODEL,
+                    "max_tokens": 1000,
+                    "temperature": 0.7,
+                    "system": EVALUATION_SYSTEM_PROMPT,
+                    "messages": [{
+                        "role": "user",
+                        "content": target_agent.build_evaluation_prompt(proposal.trade)
+                    }]
+                }
+            }
+            for i, (proposal, target_agent) in enumerate(pending)
+        ]
+        batch = await self.anthropic.messages.batches.create(requests=requests)
+        
+        # Wait for the batch to finish processing
+        while batch.processing_status != "ended":
+            await asyncio.sleep(BATCH_POLL_INTERVAL)
+            batch = await self.anthropic.messages.batches.retrieve(batch.id)
+        
+        # Collect the text of each successful evaluation
+        texts = {}
+        async for entry in await self.anthropic.messages.batches.results(batch.id):
+            if entry.result.type == "succeeded":
+                texts[entry.custom_id] = "".join(
+                    content.text for content in entry.result.message.content if content.type == "text"
+                )
+            else:
+                print(f"Batch evaluation {entry.custom_id} did not succeed: {entry.result.type}")
+        
+        # Apply the evaluations in proposal order
+        results = []
+        for i, (proposal, target_agent) in enumerate(pending):
+            try:
+                text_response = texts.get(f"{i}_{target_agent.team_abbr}")
+                if text_response is None:
+                    continue
+                
+                evaluation = target_agent.parse_evaluation(text_response)
+                results.append(self._apply_evaluation(proposal, target_agent, evaluation))
+            except Exception as e:
+                print(f"Error processing batched trade proposal from {proposal.trade.proposed_by}: {str(e)}")
+        
+        # Save league state
+        await self.league_state.flush_async(self.league_state_path)
+        
+        return results
+    
+    async def _collect_proposals(self, teams: List[str]) -> Dict[str, List[tuple[TradeProposal, GMAgent]]]:
+        """Let each agent consider initiating trades concurrently, pairing proposals with their target agent"""
+        teams = [team_abbr for team_abbr in teams if team_abbr != self.user_team]
+        outcomes = await asyncio.gather(*[
+            self.agents[team_abbr].consider_initiating_trades() for team_abbr in teams
+        ], return_exceptions=True)
+        
+        proposals_by_team = {}
+        for team_abbr, proposals in zip(teams, outcomes):
+            if isinstance(proposals, BaseException):
+                print(f"Error generating trade proposals for {team_abbr}: {str(proposals)}")
+                continue
+            
+            proposals_by_team[team_abbr] = []
+            for proposal in proposals:
+                trade = proposal.trade
+                target_team = trade.team2 if trade.team1 == team_abbr else trade.team1
+                proposals_by_team[team_abbr].append((proposal, self.agents[target_team]))
+        
+        return proposals_by_team
+    
+    async def _respond_to_proposals(self, pending: List[tuple[TradeProposal, GMAgent]]) -> List[Dict[str, Any]]:
+        """Evaluate agent trade proposals concurrently, then apply the responses in order
+        
+        Each target agent evaluates its own proposals one at a time, while different
+        target agents evaluate theirs concurrently. The league state is not saved;
+        callers flush it once they are done.
+        """
+        # Group proposals by the agent that has to evaluate them
+        by_target: Dict[str, List[int]] = {}
+        for i, (_, target_agent) in enumerate(pending):
+            by_target.setdefault(target_agent.team_abbr, []).append(i)
+        
+        evaluations: List[Any] = [None] * len(pending)
+        
+        async def evaluate_for_target(indices: List[int]):
+            for i in indices:
+                proposal, target_agent = pending[i]
+                try:
+                    evaluations[i] = await target_agent.evaluate_trade_with_claude(proposal.trade)
+                except Exception as e:
+                    evaluations[i] = e
+        
+        await asyncio.gather(*[evaluate_for_target(indices) for indices in by_target.values()])
+        
+        results = []
+        for (proposal, target_agent), evaluation in zip(pending, evaluations):
+            try:
+                if isinstance(evaluation, BaseException):
+                    raise evaluation
+                results.append(self._apply_evaluation(proposal, target_agent, evaluation))
+            except Exception as e:
+                print(f"Error processing trade proposal from {proposal.trade.proposed_by}: {str(e)}")
+        
+        return results
+    
+    def _apply_evaluation(self, proposal: TradeProposal, target_agent: GMAgent, evaluation: Dict[str, Any]) -> Dict[str, Any]:
+        """Record a trade proposal and act on the target agent's evaluation of it"""
+        trade = proposal.trade
+        self.league_state.add_trade(trade)
+        
+        # An earlier trade in the same cycle may already have moved some of these players
+        if not self._trade_players_available(trade):
+            response = self._reject_stale_trade(trade)
+        else:
+            response = target_agent.build_trade_response(trade, evaluation)
+            
+            # If accepted, execute the trade
+            if response.status == "accepted":
+                self.league_state.execute_trade(trade)
+            elif response.status == "countered" and response.counter_trade:
+                self.league_state.add_trade(response.counter_trade)
+        
+        return {
+            "proposal": proposal,
+            "response": response
+        }
+    
+    def _reject_stale_trade(self, trade: Trade) -> TradeResponse:
+        """Reject a trade whose players are no longer all on the teams trading them"""
+        self.league_state.set_trade_status(trade, "rejected")
+        return TradeResponse(
+            trade_id=trade.id,
+            status="rejected",
+            message="This trade is no longer possible because the rosters have changed."
+        )
+    
+    def _trade_players_available(self, trade: Trade) -> bool:
+        """Check that every player in a trade is still on the team trading them"""
+        for team_abbr, player_ids in ((trade.team1, trade.team1_players), (trade.team2, trade.team2_players)):
+            team = self.league_state.get_team_by_abbreviation(team_abbr)
+            if not team:
+                return False
+            if not all(team.get_player(player_id) for player_id in player_ids):
+                return False
+        return True
+    
     def get_league_activity(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get recent league activity"""
-        # Sort trades by timestamp, most recent first
-        sorted_trades = sorted(
-            self.league_state.trades, 
-            key=lambda t: t.timestamp, 
-            reverse=True
-        )
+        # Most recent trades first; only the top few need ordering
+        recent_trades = heapq.nlargest(limit, self.league_state.trades, key=lambda t: t.timestamp)
+        
+        # Resolve the names of every traded player up front, once per player
+        player_ids = {
+            player_id
+            for trade in recent_trades
+            for player_id in (*trade.team1_players, *trade.team2_players)
+        }
+        names = {}
+        for player_id in player_ids:
+            result = self.league_state.get_player_by_id(player_id)
+            if result:
+                names[player_id] = result[0].name
         
         activity = []
-        for trade in sorted_trades[:limit]:
+        for trade in recent_trades:
             team1 = self.league_state.get_team_by_abbreviation(trade.team1)
             team2 = self.league_state.get_team_by_abbreviation(trade.team2)
             
             if not team1 or not team2:
                 continue
             
-            # Get player names
-            team1_players = []
-            for player_id in trade.team1_players:
-                result = self.league_state.get_player_by_id(player_id)
-                if result:
-                    player, _ = result
-                    team1_players.append(player.name)
-            
-            team2_players = []
-            for player_id in trade.team2_players:
-                result = self.league_state.get_player_by_id(player_id)
-                if result:
-                    player, _ = result
-                    team2_players.append(player.name)
+            team1_players = [names[player_id] for player_id in trade.team1_players if player_id in names]
+            team2_players = [names[player_id] for player_id in trade.team2_players if player_id in names]
             
             activity.append({
                 "id": trade.id,
@@ -899,12 +1248,54 @@ class GMAgentManager:
         
         return activity
     
+    def get_teams_json(self) -> bytes:
+        """Get the list of all teams as a serialized JSON response body"""
+        if self._teams_json is None:
+            teams = [
+                {
+                    "id": team.id,
+                    "name": team.name,
+                    "abbreviation": team.abbreviation,
+                    "city": team.city,
+                    "conference": team.conference,
+                    "division": team.division
+                }
+                for team in self.league_state.teams.values()
+            ]
+            self._teams_json = json.dumps({"teams": teams}).encode()
+        return self._teams_json
+    
     def get_team_roster(self, team_abbr: str) -> Dict[str, Any]:
-        """Get a team's roster"""
+        """Get a team's roster
+        
+        The result is cached until the roster changes and shared between callers, so
+        don't modify it.
+        """
+        cached = self._cached_roster(team_abbr)
+        return cached[1] if cached else {"error": "Team not found"}
+    
+    def get_team_roster_json(self, team_abbr: str) -> bytes:
+        """Get a team's roster as a serialized JSON response body"""
+        cached = self._cached_roster(team_abbr)
+        return cached[2] if cached else pydantic_core.to_json({"error": "Team not found"})
+    
+    def _cached_roster(self, team_abbr: str) -> Optional[tuple[int, Dict[str, Any], bytes]]:
+        """Get a team's roster response and its JSON, rebuilding them if the roster changed"""
         team = self.league_state.get_team_by_abbreviation(team_abbr)
         if not team:
-            return {"error": "Team not found"}
+            return None
         
+        cached = self._rosters.get(team_abbr)
+        if cached and cached[0] == team.roster_version:
+            return cached
+        
+        roster = self._build_team_roster(team)
+        cached = (team.roster_version, roster, pydantic_core.to_json(roster))
+        self._rosters[team_abbr] = cached
+        return cached
+    
+    def _build_team_roster(self, team: Team) -> Dict[str, Any]:
+        """Build a team's roster response"""
         players = []
         for player in team.players:
             players.append({
@@ -942,8 +1333,17 @@ class GMAgentManager:
             }
         }
 
-# Initialize the manager
-manager = GMAgentManager()
+# Default manager, created on first access to gm_agent.manager so importing this
+# module doesn't load (or generate and save) the league
+_manager: Optional[GMAgentManager] = None
+
+def __getattr__(name: str):
+    global _manager
+    if name == "manager":
+        if _manager is None:
+            _manager = GMAgentManager()
+        return _manager
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 async def main():
     """Test function"""
@@ -974,6 +1374,7 @@ async def main():
         # Clean up MCP resources
         if hasattr(agent, 'disconnect_from_mcp_server'):
             await agent.disconnect_from_mcp_server()
+        await MCPRegistry.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
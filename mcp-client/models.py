@@ -1,8 +1,13 @@
+from collections import Counter
 from typing import List, Dict, Optional, Any
-from pydantic import BaseModel, Field
-import json
+from pydantic import BaseModel, Field, PrivateAttr
+import pydantic_core
+import asyncio
 import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 
 class Player(BaseModel):
     id: str
@@ -33,23 +38,79 @@ class Team(BaseModel):
     draft_picks: List[DraftPick]
     salary_cap: float = 123000000  # Default 2023-24 NBA salary cap
     luxury_tax: float = 150000000  # Default 2023-24 NBA luxury tax threshold
+    _players_by_id: Dict[str, Player] = PrivateAttr(default_factory=dict)
+    _players_by_position: Dict[str, List[Player]] = PrivateAttr(default_factory=dict)
+    _position_counts: Dict[str, int] = PrivateAttr(default_factory=dict)
+    _total_salary: float = PrivateAttr(default=0)
+    _roster_version: int = PrivateAttr(default=0)
+    
+    def model_post_init(self, __context: Any) -> None:
+        """Build the roster index from the loaded players"""
+        self._rebuild_roster()
+    
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        # Assigning a new roster list invalidates the index and cached salary
+        if name == "players":
+            self._rebuild_roster()
+    
+    def _rebuild_roster(self):
+        """Re-index the roster and recompute its salary; runs whenever players is assigned"""
+        # One pass over the roster fills every index and the salary total
+        players_by_id = {}
+        players_by_position: Dict[str, List[Player]] = {}
+        total_salary = 0
+        for player in self.players:
+            players_by_id[player.id] = player
+            players_by_position.setdefault(player.position, []).append(player)
+            total_salary += player.salary
+        
+        self._players_by_id = players_by_id
+        self._players_by_position = players_by_position
+        self._position_counts = Counter({pos: len(players) for pos, players in players_by_position.items()})
+        self._total_salary = total_salary
+        self._roster_version += 1
+    
+    @property
+    def roster_version(self) -> int:
+        """Counter that changes every time the roster changes"""
+        return self._roster_version
+    
+    def set_players(self, players: List[Player]):
+        """Replace the roster and keep the index in sync"""
+        self.players = players
+    
+    def get_player(self, player_id: str) -> Optional[Player]:
+        """Get a player on this roster by ID"""
+        return self._players_by_id.get(player_id)
+    
+    def get_players(self, player_ids: List[str]) -> List[Player]:
+        """Get the players on this roster with the given IDs, skipping any that aren't here"""
+        return [self._players_by_id[i] for i in player_ids if i in self._players_by_id]
+    
+    def players_at_position(self, position: str) -> List[Player]:
+        """Get the rostered players at a position, in roster order"""
+        return self._players_by_position.get(position, [])
+    
+    def position_counts(self) -> Dict[str, int]:
+        """Get the number of rostered players at each position"""
+        return self._position_counts
     
     def total_salary(self) -> float:
-        return sum(player.salary for player in self.players)
+        return self._total_salary
     
     def is_over_cap(self) -> bool:
-        return self.total_salary() > self.salary_cap
+        return self._total_salary > self.salary_cap
     
     def is_over_luxury_tax(self) -> bool:
-        return self.total_salary() > self.luxury_tax
+        return self._total_salary > self.luxury_tax
     
     def available_cap_space(self) -> float:
-        if self.is_over_cap():
-            return 0
-        return self.salary_cap - self.total_salary()
+        return max(0, self.salary_cap - self._total_salary)
 
 class Trade(BaseModel):
-    id: str = Field(default_factory=lambda: f"trade_{datetime.now().strftime('%Y%m%d%H%M%S')}")
+    # Trades are proposed concurrently, so the timestamp alone doesn't make IDs unique
+    id: str = Field(default_factory=lambda: f"trade_{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}")
     team1: str  # Team abbreviation
     team2: str  # Team abbreviation
     team1_players: List[str] = Field(default_factory=list)  # Player IDs
@@ -71,19 +132,167 @@ class TradeResponse(BaseModel):
     message: str
     counter_trade: Optional[Trade] = None
 
+class JournalEntry(BaseModel):
+    """A trade change recorded in the league state's trade journal"""
+    op: str  # add, status, execute
+    id: Optional[str] = None
+    status: Optional[str] = None
+    trade: Optional[Trade] = None
+
+# Trade journal entries allowed to pile up before the full snapshot is rewritten
+SNAPSHOT_INTERVAL = 100
+
+# Single writer thread, so snapshot and journal writes reach disk in the order they were made
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="league-writer")
+
+def journal_path(filepath: str) -> str:
+    """Get the path of the trade journal that goes with a league state file"""
+    return f"{filepath}.trades.jsonl"
+
 class LeagueState(BaseModel):
     teams: Dict[str, Team]
     trades: List[Trade] = Field(default_factory=list)
+    _trades_by_id: Dict[str, Trade] = PrivateAttr(default_factory=dict)
+    _teams_by_abbr: Dict[str, Team] = PrivateAttr(default_factory=dict)
+    _player_teams: Dict[str, Team] = PrivateAttr(default_factory=dict)
+    _dirty: bool = PrivateAttr(default=False)
+    # Trade changes not yet journaled, and the number of entries journaled since the last snapshot
+    _journal: List[tuple[str, Trade]] = PrivateAttr(default_factory=list)
+    _journal_length: int = PrivateAttr(default=0)
+    
+    def model_post_init(self, __context: Any) -> None:
+        """Build the team, player and trade indices from the loaded state"""
+        for team in self.teams.values():
+            self._teams_by_abbr.setdefault(team.abbreviation, team)
+            for player in team.players:
+                self._player_teams[player.id] = team
+        for trade in self.trades:
+            self._trades_by_id.setdefault(trade.id, trade)
+    
+    def add_trade(self, trade: Trade):
+        """Add a trade to the league and index it by ID"""
+        self.trades.append(trade)
+        self._trades_by_id.setdefault(trade.id, trade)
+        self._journal.append(("add", trade))
+    
+    def set_trade_status(self, trade: Trade, status: str):
+        """Update a trade's status"""
+        trade.status = status
+        self._journal.append(("status", trade))
+    
+    def get_trade(self, trade_id: str) -> Optional[Trade]:
+        """Get a trade by its ID"""
+        return self._trades_by_id.get(trade_id)
+    
+    def mark_dirty(self):
+        """Record a change the trade journal can't express, so the next flush saves a full snapshot"""
+        self._dirty = True
     
-    def save(self, filepath: str):
-        """Save the league state to a JSON file"""
-        # Convert to dict and handle datetime serialization
-        data = self.model_dump()
-        for trade in data['trades']:
-            trade['timestamp'] = trade['timestamp'].isoformat()
+    def _needs_snapshot(self, filepath: str) -> bool:
+        """Check whether pending changes require rewriting the full snapshot"""
+        return (
+            self._dirty
+            or self._journal_length + len(self._journal) > SNAPSHOT_INTERVAL
+            or not os.path.exists(filepath)
+        )
+    
+    def flush(self, filepath: str):
+        """Persist unsaved changes, appending them to the trade journal when possible"""
+        if self._needs_snapshot(filepath):
+            self.save(filepath)
+        elif self._journal:
+            _writer.submit(self._append_journal, self._take_journal(), filepath).result()
+    
+    async def flush_async(self, filepath: str):
+        """Persist unsaved changes without blocking the event loop"""
+        if self._needs_snapshot(filepath):
+            await self.save_async(filepath)
+        elif self._journal:
+            lines = self._take_journal()
+            await asyncio.wrap_future(_writer.submit(self._append_journal, lines, filepath))
+    
+    def save(self, filepath: str, pretty: bool = False):
+        """Save the full league state to a JSON file
         
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=2)
+        Args:
+            filepath: Path of the league state file
+            pretty: Indent the JSON for reading; compact output is smaller and faster to write
+        """
+        _writer.submit(self._write_snapshot, self._snapshot(pretty), filepath).result()
+    
+    async def save_async(self, filepath: str, pretty: bool = False):
+        """Save the full league state to a JSON file from the writer thread"""
+        # Take the snapshot here so other coroutines can't mutate the state mid-dump
+        data = self._snapshot(pretty)
+        await asyncio.wrap_future(_writer.submit(self._write_snapshot, data, filepath))
+    
+    def _snapshot(self, pretty: bool = False) -> bytes:
+        """Serialize the league state and reset the pending changes"""
+        # Serialize straight from the models to JSON bytes, without an intermediate dict
+        data = self.__pydantic_serializer__.to_json(self, indent=2 if pretty else None)
+        self._dirty = False
+        self._journal = []
+        self._journal_length = 0
+        return data
+    
+    def _take_journal(self) -> List[bytes]:
+        """Serialize the pending trade changes as journal lines and clear them"""
+        lines = []
+        for op, trade in self._journal:
+            if op == "status":
+                entry = {"op": op, "id": trade.id, "status": trade.status}
+            else:
+                entry = {"op": op, "trade": trade.model_dump()}
+            lines.append(pydantic_core.to_json(entry))
+        self._journal_length += len(self._journal)
+        self._journal = []
+        return lines
+    
+    def _write_snapshot(self, data: bytes, filepath: str):
+        """Write a league state snapshot to disk, replacing the trade journal"""
+        # Write to a temporary file first so a failed save never leaves a torn file
+        tmp_path = f"{filepath}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, filepath)
+        
+        # The snapshot includes everything journaled so far
+        if os.path.exists(journal_path(filepath)):
+            os.remove(journal_path(filepath))
+    
+    def _append_journal(self, lines: List[bytes], filepath: str):
+        """Append serialized trade changes to the journal"""
+        # Write each line through the file buffer instead of joining them into one more copy
+        with open(journal_path(filepath), 'ab') as f:
+            for line in lines:
+                f.write(line)
+                f.write(b"\n")
+    
+    def _replay_journal(self, filepath: str):
+        """Apply the trade changes journaled since the snapshot was written"""
+        if not os.path.exists(journal_path(filepath)):
+            return
+        
+        with open(journal_path(filepath), 'rb') as f:
+            for line in f:
+                try:
+                    # Validate straight from JSON into the entry and its trade
+                    entry = JournalEntry.model_validate_json(line)
+                except ValueError:
+                    break  # torn final write
+                
+                if entry.op == "add":
+                    self.add_trade(entry.trade)
+                elif entry.op == "status":
+                    trade = self.get_trade(entry.id)
+                    if trade:
+                        trade.status = entry.status
+                elif entry.op == "execute":
+                    self.execute_trade(entry.trade)
+                self._journal_length += 1
+        
+        # Replayed changes are already on disk
+        self._journal = []
     
     @classmethod
     def load(cls, filepath: str) -> "LeagueState":
@@ -91,29 +300,24 @@ class LeagueState(BaseModel):
         if not os.path.exists(filepath):
             return cls(teams={})
         
-        with open(filepath, 'r') as f:
-            data = json.load(f)
-        
-        # Handle datetime deserialization
-        for trade in data['trades']:
-            trade['timestamp'] = datetime.fromisoformat(trade['timestamp'])
+        with open(filepath, 'rb') as f:
+            data = f.read()
         
-        return cls.model_validate(data)
+        # Validate straight from JSON; this also parses the ISO trade timestamps back into datetimes
+        state = cls.model_validate_json(data)
+        state._replay_journal(filepath)
+        return state
     
     def get_team_by_abbreviation(self, abbreviation: str) -> Optional[Team]:
         """Get a team by its abbreviation"""
-        for team in self.teams.values():
-            if team.abbreviation == abbreviation:
-                return team
-        return None
+        return self._teams_by_abbr.get(abbreviation)
     
     def get_player_by_id(self, player_id: str) -> Optional[tuple[Player, Team]]:
         """Get a player by ID and return the player and their team"""
-        for team in self.teams.values():
-            for player in team.players:
-                if player.id == player_id:
-                    return (player, team)
-        return None
+        team = self._player_teams.get(player_id)
+        if team is None:
+            return None
+        return (team.get_player(player_id), team)
     
     def execute_trade(self, trade: Trade) -> bool:
         """Execute a trade between two teams"""
@@ -123,48 +327,49 @@ class LeagueState(BaseModel):
         if not team1 or not team2:
             return False
         
-        # Move players from team1 to team2
-        team1_players_to_trade = []
-        for player_id in trade.team1_players:
-            for i, player in enumerate(team1.players):
-                if player.id == player_id:
-                    team1_players_to_trade.append(player)
-                    break
-        
-        # Move players from team2 to team1
-        team2_players_to_trade = []
-        for player_id in trade.team2_players:
-            for i, player in enumerate(team2.players):
-                if player.id == player_id:
-                    team2_players_to_trade.append(player)
-                    break
+        # Split each roster into the players staying and the players moving, in one pass
+        team1_out = set(trade.team1_players)
+        team1_kept, team1_players_to_trade = [], []
+        for player in team1.players:
+            (team1_players_to_trade if player.id in team1_out else team1_kept).append(player)
         
-        # Remove players from original teams
-        team1.players = [p for p in team1.players if p.id not in trade.team1_players]
-        team2.players = [p for p in team2.players if p.id not in trade.team2_players]
+        team2_out = set(trade.team2_players)
+        team2_kept, team2_players_to_trade = [], []
+        for player in team2.players:
+            (team2_players_to_trade if player.id in team2_out else team2_kept).append(player)
         
-        # Add players to new teams
-        team1.players.extend(team2_players_to_trade)
-        team2.players.extend(team1_players_to_trade)
+        # Add the moving players to their new teams
+        team1.set_players(team1_kept + team2_players_to_trade)
+        team2.set_players(team2_kept + team1_players_to_trade)
+        for player in team1_players_to_trade:
+            self._player_teams[player.id] = team2
+        for player in team2_players_to_trade:
+            self._player_teams[player.id] = team1
         
         # TODO: Handle draft picks exchange
         
-        # Mark trade as executed
-        for i, existing_trade in enumerate(self.trades):
-            if existing_trade.id == trade.id:
-                self.trades[i].status = "accepted"
-                break
-        
-        # Add to trades list if not already there
-        if trade.id not in [t.id for t in self.trades]:
+        # Mark trade as executed, adding it to the trades list if it isn't there yet
+        existing_trade = self._trades_by_id.get(trade.id)
+        if existing_trade:
+            existing_trade.status = "accepted"
+        else:
             trade.status = "accepted"
-            self.trades.append(trade)
+            self.add_trade(trade)
+        
+        self._journal.append(("execute", trade))
         
         return True
 
 # Helper functions to generate sample data
 def generate_sample_players(team_abbr: str, count: int = 15) -> List[Player]:
     """Generate sample players for a team"""
+    # Players are never mutated in place (trades reassign roster lists), so shallow
+    # copies of the cached players are enough to keep each league's players separate
+    return [player.model_copy() for player in _sample_players(team_abbr, count)]
+
+@lru_cache(maxsize=None)
+def _sample_players(team_abbr: str, count: int) -> tuple[Player, ...]:
+    """Build and validate a team's sample players once; they only depend on the arguments"""
     positions = ["PG", "SG", "SF", "PF", "C"]
     sample_players = []
     
@@ -193,7 +398,7 @@ def generate_sample_players(team_abbr: str, count: int = 15) -> List[Player]:
         )
         sample_players.append(player)
     
-    return sample_players
+    return tuple(sample_players)
 
 def generate_sample_draft_picks(team_abbr: str) -> List[DraftPick]:
     """Generate sample draft picks for a team"""
@@ -9,6 +9,15 @@ from gm_agent import GMAgentManager
 # Initialize the league state path
 LEAGUE_STATE_PATH = "league_state.json"
 
+# Cap on trade proposals and agent trade cycles the tests run at once
+MAX_CONCURRENCY = int(os.getenv("TRADE_TEST_CONCURRENCY", "4"))
+_SEM = asyncio.Semaphore(MAX_CONCURRENCY)
+
+async def _bounded(coro):
+    """Await a coroutine once fewer than MAX_CONCURRENCY bounded calls are running"""
+    async with _SEM:
+        return await coro
+
 async def test_league_initialization():
     """Test the league initialization process"""
     print("\n=== Testing League Initialization ===")
@@ -31,16 +40,11 @@ async def test_league_initialization():
     print("✅ League initialization successful")
     return league
 
-async def test_trade_proposal_acceptance():
+async def test_trade_proposal_acceptance(manager: GMAgentManager):
     """Test a trade proposal that should be accepted"""
     print("\n=== Testing Trade Proposal Acceptance ===")
     
-    # Initialize manager
-    manager = GMAgentManager(LEAGUE_STATE_PATH)
-    
-    # Select user team
-    user_team = "LAL"  # Lakers
-    manager.select_user_team(user_team)
+    user_team = manager.user_team
     
     # Get a trade partner
     trade_partner = "BOS"  # Celtics
@@ -50,7 +54,8 @@ async def test_trade_proposal_acceptance():
     bos_roster = manager.get_team_roster(trade_partner)
     
     # Select players for the trade (lowest value players to increase acceptance chances)
-    lal_players = lal_roster["players"][-2:]  # Last two players (likely lowest value)
+    # Two of the last three players (likely lowest value); the rejection test offers the last one
+    lal_players = lal_roster["players"][-3:-1]
     bos_players = bos_roster["players"][-1:]  # Last player (likely lowest value)
     
     # Create trade that should be accepted (giving more than receiving)
@@ -70,22 +75,17 @@ async def test_trade_proposal_acceptance():
     
     # Submit proposal
     print(f"Proposing trade: {len(lal_players)} LAL players for {len(bos_players)} BOS players")
-    response = await manager.process_user_trade_proposal(proposal)
+    response = await _bounded(manager.process_user_trade_proposal(proposal))
     
     print(f"Trade response: {response.status} - {response.message}")
     
     return response
 
-async def test_trade_proposal_rejection():
+async def test_trade_proposal_rejection(manager: GMAgentManager):
     """Test a trade proposal that should be rejected"""
     print("\n=== Testing Trade Proposal Rejection ===")
     
-    # Initialize manager
-    manager = GMAgentManager(LEAGUE_STATE_PATH)
-    
-    # Select user team
-    user_team = "LAL"  # Lakers
-    manager.select_user_team(user_team)
+    user_team = manager.user_team
     
     # Get a trade partner
     trade_partner = "MIA"  # Heat
@@ -115,22 +115,17 @@ async def test_trade_proposal_rejection():
     
     # Submit proposal
     print(f"Proposing imbalanced trade: {len(lal_players)} LAL players for {len(mia_players)} MIA players")
-    response = await manager.process_user_trade_proposal(proposal)
+    response = await _bounded(manager.process_user_trade_proposal(proposal))
     
     print(f"Trade response: {response.status} - {response.message}")
     
     return response
 
-async def test_trade_counter_offer():
+async def test_trade_counter_offer(manager: GMAgentManager):
     """Test a trade proposal that should result in a counter offer"""
     print("\n=== Testing Trade Counter Offer ===")
     
-    # Initialize manager
-    manager = GMAgentManager(LEAGUE_STATE_PATH)
-    
-    # Select user team
-    user_team = "LAL"  # Lakers
-    manager.select_user_team(user_team)
+    user_team = manager.user_team
     
     # Get a trade partner
     trade_partner = "GSW"  # Warriors
@@ -160,7 +155,7 @@ async def test_trade_counter_offer():
     
     # Submit proposal
     print(f"Proposing slightly imbalanced trade: {len(lal_players)} LAL players for {len(gsw_players)} GSW players")
-    response = await manager.process_user_trade_proposal(proposal)
+    response = await _bounded(manager.process_user_trade_proposal(proposal))
     
     print(f"Trade response: {response.status} - {response.message}")
     
@@ -172,24 +167,18 @@ async def test_trade_counter_offer():
     
     return response
 
-async def test_agent_to_agent_trades():
+async def test_agent_to_agent_trades(manager: GMAgentManager):
     """Test agent-to-agent trading"""
     print("\n=== Testing Agent-to-Agent Trading ===")
     
-    # Initialize manager
-    manager = GMAgentManager(LEAGUE_STATE_PATH)
-    
-    # Select user team
-    user_team = "LAL"  # Lakers
-    manager.select_user_team(user_team)
-    
-    # Run a few agent trade cycles
+    # Run a few agent trade cycles concurrently; trades whose players were moved by
+    # another cycle in the meantime are rejected rather than executed
     print("Running 3 agent trade cycles...")
     
-    for i in range(3):
+    all_results = await asyncio.gather(*(_bounded(manager.run_agent_trade_cycle()) for _ in range(3)))
+    
+    for i, results in enumerate(all_results):
         print(f"\nCycle {i+1}:")
-        results = await manager.run_agent_trade_cycle()
-        
         if results:
             for idx, result in enumerate(results):
                 proposal = result["proposal"]
@@ -210,6 +199,12 @@ async def test_agent_to_agent_trades():
     
     return activity
 
+def task_has_status(task: asyncio.Task, status: str) -> bool:
+    """Check the response of a trade test task, which may have failed or been cancelled"""
+    if task.cancelled() or task.exception():
+        return False
+    return task.result().status == status
+
 async def main():
     """Run all tests"""
     print("=== Starting Trade System Tests ===\n")
@@ -218,22 +213,30 @@ async def main():
         # Initialize league
         await test_league_initialization()
         
-        # Test trade acceptance
-        accept_response = await test_trade_proposal_acceptance()
-        
-        # Test trade rejection
-        reject_response = await test_trade_proposal_rejection()
+        # Share one manager, playing as the Lakers, across the trade tests
+        manager = GMAgentManager(LEAGUE_STATE_PATH)
+        manager.select_user_team("LAL")
         
-        # Test counter offer
-        counter_response = await test_trade_counter_offer()
+        # Test trade acceptance, rejection and counter offers concurrently; each trades
+        # different LAL players with a different partner, so none of them can make
+        # another's trade stale and their Claude round-trips can overlap.
+        # If one fails, the task group cancels the others and reports every failure.
+        try:
+            async with asyncio.TaskGroup() as tg:
+                accept_task = tg.create_task(test_trade_proposal_acceptance(manager))
+                reject_task = tg.create_task(test_trade_proposal_rejection(manager))
+                counter_task = tg.create_task(test_trade_counter_offer(manager))
+        except* Exception as group:
+            for error in group.exceptions:
+                print(f"❌ Error during trade test: {error!r}")
         
         # Test agent-to-agent trades
-        activity = await test_agent_to_agent_trades()
+        activity = await test_agent_to_agent_trades(manager)
         
         print("\n=== Test Summary ===")
-        print(f"Trade Acceptance Test: {'✅ Passed' if accept_response.status == 'accepted' else '❌ Failed'}")
-        print(f"Trade Rejection Test: {'✅ Passed' if reject_response.status == 'rejected' else '❌ Failed'}")
-        print(f"Trade Counter Test: {'✅ Passed' if counter_response.status == 'countered' else '❌ Failed'}")
+        print(f"Trade Acceptance Test: {'✅ Passed' if task_has_status(accept_task, 'accepted') else '❌ Failed'}")
+        print(f"Trade Rejection Test: {'✅ Passed' if task_has_status(reject_task, 'rejected') else '❌ Failed'}")
+        print(f"Trade Counter Test: {'✅ Passed' if task_has_status(counter_task, 'countered') else '❌ Failed'}")
         print(f"Agent-to-Agent Test: {'✅ Passed' if activity else '❌ Failed'}")
         
     except Exception as e:
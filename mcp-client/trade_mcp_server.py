@@ -6,22 +6,88 @@ It acts as a simple wrapper around the NBA API for use with the GM agent.
 """
 
 from mcp.server.fastmcp import FastMCP
+import asyncio
+import functools
+import inspect
 import time
 import signal
 import sys
 import os
+import pydantic_core
+from collections import Counter, defaultdict
+from contextlib import suppress
 from typing import Optional, List, Dict, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
 from nba_api.stats.static import players, teams
-from nba_api.stats.endpoints import commonplayerinfo, playercareerstats
 
-# Handle SIGINT (Ctrl+C) gracefully
-def signal_handler(sig, frame):
-    print("Shutting down NBA trade MCP server gracefully...")
-    sys.exit(0)
+# Seconds an NBA API response stays cached; agents look up the same players repeatedly
+NBA_API_CACHE_TTL = 3600
 
-signal.signal(signal.SIGINT, signal_handler)
+# Seconds a shutdown waits for tool calls still running
+SHUTDOWN_GRACE_PERIOD = 10
+
+# nba_api's static players and teams by lower-case full name, built once at startup so
+# exact-name lookups skip the regex scan over every player
+_PLAYERS_BY_NAME: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+for _player in players.get_players():
+    _PLAYERS_BY_NAME[_player['full_name'].lower()].append(_player)
+
+_TEAMS_BY_NAME: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+for _team in teams.get_teams():
+    _TEAMS_BY_NAME[_team['full_name'].lower()].append(_team)
+
+# Tasks handling tool calls that haven't sent their response yet, which a shutdown lets finish
+_in_flight: set[asyncio.Task] = set()
+
+def _drained_on_shutdown(fn):
+    """Track the task handling each call of a tool until it finishes
+    
+    That task is the MCP server's request handler, which only finishes once the tool's
+    response has been sent, so a shutdown that waits for it doesn't drop the response.
+    """
+    def track():
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:  # Called directly, outside the server's event loop
+            return
+        if task is not None and task not in _in_flight:
+            _in_flight.add(task)
+            task.add_done_callback(_in_flight.discard)
+    
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            track()
+            return await fn(*args, **kwargs)
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            track()
+            return fn(*args, **kwargs)
+    return wrapper
+
+# Tool calls currently running, by tool and arguments, which duplicate calls wait on
+_coalesced: Dict[tuple, asyncio.Task] = {}
+
+def _single_flight(key_fn):
+    """Make concurrent calls of an async tool with the same key share a single run
+    
+    Later callers await the first caller's task instead of repeating its lookups. The
+    task is shielded, so a caller that gets cancelled doesn't cancel it for the others.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            key = (fn.__name__, key_fn(*args, **kwargs))
+            task = _coalesced.get(key)
+            if task is None:
+                task = asyncio.create_task(fn(*args, **kwargs))
+                _coalesced[key] = task
+                task.add_done_callback(lambda _: _coalesced.pop(key, None))
+            return await asyncio.shield(task)
+        return wrapper
+    return decorator
 
 # Create an MCP server with increased timeout
 mcp = FastMCP(
@@ -35,9 +101,12 @@ mcp = FastMCP(
 
 class PlayerInfoInput(BaseModel):
     player_name: str = Field(..., description="Name of the NBA player to search for")
+    verbose: bool = Field(default=False, description="Include the full NBA API response")
 
 @mcp.tool()
-def nba_get_player_info(player_name: str) -> Dict[str, Any]:
+@_drained_on_shutdown
+@_single_flight(lambda player_name, verbose=False: (player_name.lower(), verbose))
+async def nba_get_player_info(player_name: str, verbose: bool = False) -> Dict[str, Any]:
     """Get basic information about an NBA player by name.
     
     This tool searches for an NBA player by name and returns basic information
@@ -45,15 +114,19 @@ def nba_get_player_info(player_name: str) -> Dict[str, Any]:
     
     Args:
         player_name: Name of the NBA player to search for
+        verbose: Also include the full NBA API player info response under "details"
     
     Returns:
         A dictionary containing information about the player, including their ID,
-        name, team, and active status. If no player is found or multiple players
-        match the name, appropriate error information is returned.
+        name, team, position, physical profile, experience, headline stats, and active
+        status. If no player is found or multiple players match the name, appropriate
+        error information is returned.
     """
     try:
-        # Search for players matching the name
-        player_results = players.find_players_by_full_name(player_name)
+        # Look the name up exactly, then fall back to nba_api's partial-match search
+        player_results = _PLAYERS_BY_NAME.get(player_name.lower())
+        if not player_results:
+            player_results = await asyncio.to_thread(players.find_players_by_full_name, player_name)
         
         if not player_results:
             return {"error": f"No NBA player found with name '{player_name}'"}
@@ -69,15 +142,25 @@ def nba_get_player_info(player_name: str) -> Dict[str, Any]:
         
         # Fetch detailed player info if active
         if player_info['is_active']:
-            detailed_info = commonplayerinfo.CommonPlayerInfo(player_id=player_id)
-            player_data = detailed_info.get_normalized_dict()
-            return {
+            player_data = await _cached_fetch(("player_info", player_id), _fetch_common_player_info, player_id)
+            
+            # Only return the fields agents use; the full response is mostly season listings
+            common_info = (player_data.get('CommonPlayerInfo') or [{}])[0]
+            result = {
                 "id": player_id,
                 "name": player_info['full_name'],
-                "team": player_data.get('CommonPlayerInfo', [{}])[0].get('TEAM_NAME', 'Unknown'),
-                "active": True,
-                "details": player_data
+                "team": common_info.get('TEAM_NAME', 'Unknown'),
+                "position": common_info.get('POSITION'),
+                "height": common_info.get('HEIGHT'),
+                "weight": common_info.get('WEIGHT'),
+                "birthdate": common_info.get('BIRTHDATE'),
+                "season_experience": common_info.get('SEASON_EXP'),
+                "headline_stats": (player_data.get('PlayerHeadlineStats') or [{}])[0],
+                "active": True
             }
+            if verbose:
+                result["details"] = player_data
+            return result
         else:
             return {
                 "id": player_id,
@@ -88,6 +171,34 @@ def nba_get_player_info(player_name: str) -> Dict[str, Any]:
     except Exception as e:
         return {"error": f"Error fetching player info: {str(e)}"}
 
+class PlayersInfoBatchInput(BaseModel):
+    player_names: List[str] = Field(..., description="Names of the NBA players to search for")
+    verbose: bool = Field(default=False, description="Include the full NBA API responses")
+
+@mcp.tool()
+@_drained_on_shutdown
+async def nba_get_players_info_batch(player_names: List[str], verbose: bool = False) -> Dict[str, Any]:
+    """Get basic information about several NBA players by name in one call.
+    
+    This tool looks up every player concurrently, the same way nba_get_player_info
+    looks up a single player. Use it instead of one call per player when you need
+    information about everyone involved in a trade.
+    
+    Args:
+        player_names: Names of the NBA players to search for
+        verbose: Also include each player's full NBA API player info response
+    
+    Returns:
+        A dictionary mapping each requested name to the result nba_get_player_info
+        returns for it, including error information for names that couldn't be found.
+    """
+    names = list(dict.fromkeys(player_names))
+    results = await asyncio.gather(*(nba_get_player_info(name, verbose) for name in names), return_exceptions=True)
+    return {
+        name: {"error": f"Error fetching player info: {str(result)}"} if isinstance(result, Exception) else result
+        for name, result in zip(names, results)
+    }
+
 # -------------------------------------------------------------
 # Player Stats Tool
 # -------------------------------------------------------------
@@ -97,7 +208,8 @@ class PlayerStatsInput(BaseModel):
     per_mode: str = Field(default="PerGame", description="Per game or total stats (e.g., 'PerGame', 'Totals')")
 
 @mcp.tool()
-def nba_get_player_stats(player_id: str, per_mode: str = "PerGame") -> Dict[str, Any]:
+@_drained_on_shutdown
+async def nba_get_player_stats(player_id: str, per_mode: str = "PerGame") -> str:
     """Get career statistics for an NBA player by ID.
     
     This tool retrieves comprehensive career statistics for an NBA player
@@ -108,18 +220,13 @@ def nba_get_player_stats(player_id: str, per_mode: str = "PerGame") -> Dict[str,
         per_mode: Stats calculation mode (PerGame, Totals, etc.)
     
     Returns:
-        A dictionary containing the player's career statistics, including
+        A JSON object containing the player's career statistics, including
         regular season and playoff stats.
     """
     try:
-        career_stats = playercareerstats.PlayerCareerStats(
-            player_id=player_id,
-            per_mode36=per_mode
-        )
-        
-        return career_stats.get_normalized_dict()
+        return _to_compact_json(await _cached_fetch(("career_stats", player_id, per_mode), _fetch_career_stats, player_id, per_mode))
     except Exception as e:
-        return {"error": f"Error fetching player stats: {str(e)}"}
+        return _to_compact_json({"error": f"Error fetching player stats: {str(e)}"})
 
 # -------------------------------------------------------------
 # Team Info Tool
@@ -129,7 +236,8 @@ class TeamInfoInput(BaseModel):
     team_name: str = Field(..., description="Name of the NBA team to search for")
 
 @mcp.tool()
-def nba_get_team_info(team_name: str) -> Dict[str, Any]:
+@_drained_on_shutdown
+async def nba_get_team_info(team_name: str) -> Dict[str, Any]:
     """Get information about an NBA team by name.
     
     This tool searches for an NBA team by name and returns information about
@@ -145,7 +253,9 @@ def nba_get_team_info(team_name: str) -> Dict[str, Any]:
     """
     try:
         # Search for teams matching the name
-        team_results = teams.find_teams_by_full_name(team_name)
+        team_results = _TEAMS_BY_NAME.get(team_name.lower())
+        if not team_results:
+            team_results = await asyncio.to_thread(teams.find_teams_by_full_name, team_name)
         
         if not team_results:
             return {"error": f"No NBA team found with name '{team_name}'"}
@@ -164,7 +274,10 @@ def nba_get_team_info(team_name: str) -> Dict[str, Any]:
 # Trade Analysis Tool
 # -------------------------------------------------------------
 
+# The trade analysis inputs are read-only; fields the agent sends beyond these are ignored
 class PlayerBasicInfo(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+    
     id: Optional[str] = None
     name: str
     position: str
@@ -173,6 +286,8 @@ class PlayerBasicInfo(BaseModel):
     salary: float
 
 class TradeParticipant(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+    
     team_name: str
     players: List[PlayerBasicInfo]
 
@@ -181,7 +296,8 @@ class TradeAnalysisInput(BaseModel):
     team2: TradeParticipant
 
 @mcp.tool()
-def nba_analyze_trade(team1: TradeParticipant, team2: TradeParticipant) -> Dict[str, Any]:
+@_drained_on_shutdown
+def nba_analyze_trade(team1: TradeParticipant, team2: TradeParticipant) -> str:
     """Analyze a potential NBA trade between two teams.
     
     This tool provides a basic analysis of a potential trade between two NBA teams,
@@ -192,29 +308,16 @@ def nba_analyze_trade(team1: TradeParticipant, team2: TradeParticipant) -> Dict[
         team2: Second team in the trade with list of players
     
     Returns:
-        A dictionary containing analysis of the trade from both teams' perspectives.
+        A JSON object containing analysis of the trade from both teams' perspectives.
     """
+    return _to_compact_json(_analyze_trade(team1, team2))
+
+def _analyze_trade(team1: TradeParticipant, team2: TradeParticipant) -> Dict[str, Any]:
+    """Compare the salaries, positions and value each team sends out in a trade"""
     try:
-        # Calculate basic trade metrics
-        team1_outgoing_salary = sum(p.salary for p in team1.players)
-        team2_outgoing_salary = sum(p.salary for p in team2.players)
-        
-        # Calculate basic player value
-        team1_value = sum(_simple_player_value(p) for p in team1.players)
-        team2_value = sum(_simple_player_value(p) for p in team2.players)
-        
-        # Get player names for easy reference
-        team1_players = [p.name for p in team1.players]
-        team2_players = [p.name for p in team2.players]
-        
-        # Analyze positions being traded
-        team1_positions = {}
-        for player in team1.players:
-            team1_positions[player.position] = team1_positions.get(player.position, 0) + 1
-            
-        team2_positions = {}
-        for player in team2.players:
-            team2_positions[player.position] = team2_positions.get(player.position, 0) + 1
+        # Summarize the players each team sends out
+        team1_players, team1_positions, team1_outgoing_salary, team1_value = _summarize_players(team1)
+        team2_players, team2_positions, team2_outgoing_salary, team2_value = _summarize_players(team2)
         
         return {
             "trade_summary": {
@@ -245,16 +348,98 @@ def nba_analyze_trade(team1: TradeParticipant, team2: TradeParticipant) -> Dict[
     except Exception as e:
         return {"error": f"Error analyzing trade: {str(e)}"}
 
+class TradeAnalysisBatchInput(BaseModel):
+    trades: List[TradeAnalysisInput]
+
+@mcp.tool()
+@_drained_on_shutdown
+def nba_analyze_trade_batch(trades: List[TradeAnalysisInput]) -> str:
+    """Analyze several potential NBA trades in one call.
+    
+    This tool runs the same analysis as nba_analyze_trade on every candidate trade.
+    Use it instead of one call per trade when comparing several trade options.
+    
+    Args:
+        trades: Candidate trades, each with the two teams and the players they send out
+    
+    Returns:
+        A JSON list with the analysis of each trade, in the order the trades were given.
+    """
+    return _to_compact_json([_analyze_trade(trade.team1, trade.team2) for trade in trades])
+
 # -------------------------------------------------------------
 # Helper functions
 # -------------------------------------------------------------
 
+def _to_compact_json(payload: Any) -> str:
+    """Serialize a tool result as compact JSON
+    
+    FastMCP passes string results through as-is, but pretty-prints anything else with
+    a two-space indent, which bloats the larger payloads sent back to the agent.
+    """
+    return pydantic_core.to_json(payload, fallback=str).decode()
+
+# nba_api's endpoint requests and static name searches are blocking, so the async tools
+# run them in a worker thread; concurrent tool calls then overlap instead of stalling
+# the server's event loop
+
+# NBA API responses by request, with the time they were fetched
+_api_cache: Dict[tuple, tuple[float, Dict[str, Any]]] = {}
+# One lock per request, so concurrent lookups of the same data make a single API call
+_api_locks: Dict[tuple, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+async def _cached_fetch(key: tuple, fetch, *args) -> Dict[str, Any]:
+    """Run a blocking NBA API fetch in a worker thread, reusing recent results for the same key"""
+    async with _api_locks[key]:
+        cached = _api_cache.get(key)
+        if cached and time.monotonic() - cached[0] < NBA_API_CACHE_TTL:
+            return cached[1]
+        
+        # Failed fetches raise, so only successful responses are cached
+        result = await asyncio.to_thread(fetch, *args)
+        
+        # Drop expired responses so the cache doesn't grow without bound
+        now = time.monotonic()
+        for stale_key in [k for k, entry in _api_cache.items() if now - entry[0] >= NBA_API_CACHE_TTL]:
+            del _api_cache[stale_key]
+        _api_cache[key] = (now, result)
+        return result
+
+def _fetch_common_player_info(player_id: int) -> Dict[str, Any]:
+    """Fetch a player's details from the stats.nba.com commonplayerinfo endpoint"""
+    # nba_api's endpoint modules are slow to import, so sessions that never look up
+    # players don't pay for them; later calls reuse the module from sys.modules
+    from nba_api.stats.endpoints import commonplayerinfo
+    return commonplayerinfo.CommonPlayerInfo(player_id=player_id).get_normalized_dict()
+
+def _fetch_career_stats(player_id: str, per_mode: str) -> Dict[str, Any]:
+    """Fetch a player's career stats from the stats.nba.com playercareerstats endpoint"""
+    from nba_api.stats.endpoints import playercareerstats
+    return playercareerstats.PlayerCareerStats(
+        player_id=player_id,
+        per_mode36=per_mode
+    ).get_normalized_dict()
+
+def _summarize_players(participant: TradeParticipant) -> tuple[List[str], Dict[str, int], float, float]:
+    """Get the names, position counts, total salary and total value of a team's traded players in one pass"""
+    names = []
+    positions = Counter()
+    salary = 0
+    value = 0
+    for player in participant.players:
+        names.append(player.name)
+        positions[player.position] += 1
+        salary += player.salary
+        value += _simple_player_value(player)
+    return names, dict(positions), salary, value
+
 def _simple_player_value(player: PlayerBasicInfo) -> float:
     """Calculate a simple player value based on stats"""
     # Basic value calculation based on available stats
-    ppg = player.stats.get("ppg", 0)
-    rpg = player.stats.get("rpg", 0)
-    apg = player.stats.get("apg", 0)
+    stats = player.stats
+    ppg = stats.get("ppg", 0)
+    rpg = stats.get("rpg", 0)
+    apg = stats.get("apg", 0)
     
     # Simple value metric
     value = ppg + (0.7 * rpg) + (0.7 * apg)
@@ -268,12 +453,43 @@ def _simple_player_value(player: PlayerBasicInfo) -> float:
 # Main entry point
 # -------------------------------------------------------------
 
+async def serve():
+    """Serve MCP over stdio until the client disconnects or a shutdown signal arrives
+    
+    On SIGINT or SIGTERM, tool calls still running get up to SHUTDOWN_GRACE_PERIOD
+    seconds to finish and send their responses before the server is cancelled.
+    """
+    loop = asyncio.get_running_loop()
+    shutdown = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, shutdown.set)
+        except NotImplementedError:  # Windows event loops don't support signal handlers
+            signal.signal(sig, lambda *_: loop.call_soon_threadsafe(shutdown.set))
+    
+    server = asyncio.create_task(mcp.run_stdio_async())
+    shutdown_requested = asyncio.create_task(shutdown.wait())
+    await asyncio.wait({server, shutdown_requested}, return_when=asyncio.FIRST_COMPLETED)
+    
+    if server.done():
+        shutdown_requested.cancel()
+        server.result()
+        return
+    
+    # stdout carries the MCP protocol, so log to stderr
+    print("Shutting down NBA trade MCP server gracefully...", file=sys.stderr)
+    if _in_flight:
+        await asyncio.wait(set(_in_flight), timeout=SHUTDOWN_GRACE_PERIOD)
+    server.cancel()
+    with suppress(asyncio.CancelledError):
+        await server
+
 if __name__ == "__main__":
     try:
-        print("Starting NBA Trade MCP server")
+        print("Starting NBA Trade MCP server", file=sys.stderr)
         print(f"Current working directory: {os.getcwd()}", file=sys.stderr)
-        mcp.run()
+        asyncio.run(serve())
     except Exception as e:
-        print(f"Error: {e}")
+        print(f"Error: {e}", file=sys.stderr)
         # Sleep before exiting to give time for error logs
         time.sleep(5)
\ No newline at end of file